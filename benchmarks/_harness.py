@@ -0,0 +1,102 @@
+"""
+Shared helpers for the standalone benchmark scripts.
+
+Each script runs against a throwaway SQLite file so benchmarks never touch
+the development database:
+
+    python -m benchmarks.bench_booking --threads 8 --bookings 400
+"""
+import atexit
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None):
+    """
+    Configure Django against a temporary SQLite database and create the schema.
+    Returns the path of the database file.
+    """
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitness_booking.settings')
+
+    import django
+    from django.conf import settings
+
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='fitness_bench_', suffix='.sqlite3')
+        os.close(fd)
+        atexit.register(os.remove, db_path)
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    django.setup()
+
+    import logging
+    logging.getLogger('booking').setLevel(logging.WARNING)
+
+    from django.core.management import call_command
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    return db_path
+
+
+def run_concurrently(worker, jobs, threads):
+    """
+    Run ``worker(job)`` for every job across ``threads`` threads.
+    Returns (elapsed_seconds, results) where results keeps the worker's
+    return values in completion order.
+    """
+    from django.db import connection
+
+    jobs = list(jobs)
+    lock = threading.Lock()
+    results = []
+
+    def run():
+        try:
+            while True:
+                with lock:
+                    if not jobs:
+                        return
+                    job = jobs.pop()
+                outcome = worker(job)
+                with lock:
+                    results.append(outcome)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - started, results
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """
+    Nearest-rank percentiles of ``samples`` in milliseconds.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{p}': None for p in points}
+    return {
+        f'p{p}': round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+        for p in points
+    }
+
+
+def report(name, **fields):
+    """
+    Print one benchmark result as a JSON line.
+    """
+    print(json.dumps({'benchmark': name, **fields}, default=str))
@@ -0,0 +1,111 @@
+"""
+Throughput of the async (ASGI) endpoints against the synchronous DRF
+(WSGI) endpoints with many concurrent clients, both driven in-process
+through Django's test clients.
+
+    python -m benchmarks.bench_asgi --clients 32 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+from benchmarks._harness import percentiles, report, run_concurrently, setup_django
+
+ENDPOINTS = {
+    'classes': ('/api/v1/classes/', '/api/v1/async/classes/', {}),
+    'bookings': ('/api/v1/bookings/', '/api/v1/async/bookings/', {'email': 'client@example.com'}),
+}
+
+
+def seed():
+    from django.utils import timezone
+    from booking.models import Booking, FitnessClass
+
+    start = timezone.now() + timedelta(days=1)
+    classes = FitnessClass.objects.bulk_create(
+        FitnessClass(
+            name='HIIT',
+            instructor=f'Instructor {n}',
+            datetime=start + timedelta(hours=n),
+            total_slots=20,
+            available_slots=19,
+        )
+        for n in range(200)
+    )
+    Booking.objects.bulk_create(
+        Booking(fitness_class=fitness_class, client_name='Client', client_email='client@example.com')
+        for fitness_class in classes[:50]
+    )
+
+
+def run_wsgi(path, params, clients, requests):
+    from django.test import Client
+
+    def worker(_):
+        started = time.perf_counter()
+        response = Client().get(path, params)
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - started
+
+    elapsed, latencies = run_concurrently(worker, range(requests), clients)
+    return elapsed, latencies
+
+
+def run_asgi(path, params, clients, requests):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        gate = asyncio.Semaphore(clients)
+        latencies = []
+
+        async def one():
+            async with gate:
+                started = time.perf_counter()
+                response = await client.get(path, params)
+                assert response.status_code == 200, response.status_code
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return time.perf_counter() - started, latencies
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), action='append')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    # Measure the database path rather than the listing cache
+    settings.CLASS_LIST_CACHE_TIMEOUT = 0
+    # Measure the endpoints, not the throttles
+    settings.THROTTLE_RATES = {}
+    seed()
+
+    for name in args.endpoint or sorted(ENDPOINTS):
+        sync_path, async_path, params = ENDPOINTS[name]
+        for server, runner, path in (
+            ('wsgi', run_wsgi, sync_path),
+            ('asgi', run_asgi, async_path),
+        ):
+            elapsed, latencies = runner(path, params, args.clients, args.requests)
+            report(
+                'asgi_vs_wsgi',
+                endpoint=name,
+                server=server,
+                clients=args.clients,
+                requests=args.requests,
+                requests_per_sec=round(args.requests / elapsed, 1),
+                latency_ms=percentiles(latencies),
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Bookings/sec under concurrent clients: the conditional-UPDATE reservation
+in BookingRequestSerializer.create against the previous lock-and-save path.
+
+    python -m benchmarks.bench_booking --threads 8 --bookings 400
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks._harness import report, run_concurrently, setup_django
+
+
+def legacy_book(class_id, client_name, client_email):
+    """
+    The pre-optimisation path: three class lookups, an exists() probe and a
+    select_for_update() followed by a full-model save.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from booking.models import Booking, FitnessClass
+
+    fitness_class = FitnessClass.objects.get(id=class_id)
+    if fitness_class.datetime <= timezone.now():
+        return False
+    fitness_class = FitnessClass.objects.get(id=class_id)
+    if Booking.objects.filter(fitness_class=fitness_class, client_email=client_email).exists():
+        return False
+    if fitness_class.available_slots <= 0:
+        return False
+    with transaction.atomic():
+        fitness_class = FitnessClass.objects.select_for_update().get(id=class_id)
+        if fitness_class.available_slots <= 0:
+            return False
+        Booking.objects.create(
+            fitness_class=fitness_class,
+            client_name=client_name,
+            client_email=client_email,
+        )
+        fitness_class.available_slots -= 1
+        fitness_class.save()
+    return True
+
+
+def current_book(class_id, client_name, client_email):
+    from booking.serializers import BookingRequestSerializer
+
+    serializer = BookingRequestSerializer(data={
+        'class_id': class_id,
+        'client_name': client_name,
+        'client_email': client_email,
+    })
+    if not serializer.is_valid():
+        return False
+    serializer.save()
+    return True
+
+
+def run(path, book, threads, bookings):
+    from django.db import OperationalError
+    from django.utils import timezone
+    from booking.models import FitnessClass
+
+    fitness_class = FitnessClass.objects.create(
+        name='YOGA',
+        instructor='Bench',
+        datetime=timezone.now() + timedelta(days=1),
+        total_slots=bookings,
+        available_slots=bookings,
+    )
+
+    def worker(n):
+        while True:
+            try:
+                return book(fitness_class.id, f'Client {n}', f'client{n}@example.com')
+            except OperationalError:
+                # SQLite reports lock contention instead of blocking; retry
+                continue
+
+    elapsed, results = run_concurrently(worker, range(bookings), threads)
+    fitness_class.refresh_from_db()
+    report(
+        'booking',
+        path=path,
+        threads=threads,
+        bookings=sum(results),
+        seconds=round(elapsed, 3),
+        bookings_per_sec=round(sum(results) / elapsed, 1),
+        available_slots=fitness_class.available_slots,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--bookings', type=int, default=400)
+    args = parser.parse_args()
+
+    setup_django()
+    run('legacy', legacy_book, args.threads, args.bookings)
+    run('conditional_update', current_book, args.threads, args.bookings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Rendering throughput for big class listings, in bytes per second.
+
+First the render step alone: serializer dicts through DRF's JSONRenderer
+against rows encoded straight to JSON and spliced into the envelope by
+EnvelopeJSONRenderer. Then whole responses through the test client: the
+streamed listing (?stream=true) and uncached 100-row pages, each plain
+and gzipped.
+
+    python -m benchmarks.bench_render --classes 20000 --repeat 5
+"""
+import argparse
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from benchmarks._harness import report, setup_django
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def throughput(seconds, payload, wire=None):
+    """
+    Rates over the JSON payload and, when compressed, the bytes sent.
+    """
+    wire = payload if wire is None else wire
+    return {
+        'payload_bytes': payload,
+        'wire_bytes': wire,
+        'seconds': round(seconds, 4),
+        'payload_mb_per_sec': round(payload / seconds / 1e6, 1),
+        'wire_mb_per_sec': round(wire / seconds / 1e6, 2),
+    }
+
+
+def decoded(response, content):
+    if response.get('Content-Encoding') == 'gzip':
+        return gzip.decompress(content)
+    return content
+
+
+def bench_renderers(rows, repeat):
+    from rest_framework.renderers import JSONRenderer
+    from booking.serializers import FitnessClassSerializer
+    from utils.renderers import EnvelopeJSONRenderer
+    from utils.response import CustomResponse
+
+    serializer = FitnessClassSerializer(many=True)
+
+    def drf():
+        data = CustomResponse.paginated_response(serializer.to_representation(rows)).data
+        return JSONRenderer().render(data)
+
+    def envelope():
+        data = CustomResponse.paginated_response(serializer.to_json(rows)).data
+        data['count'] = len(rows)
+        return EnvelopeJSONRenderer().render(data)
+
+    for path, func in (('drf_json_renderer', drf), ('envelope_renderer', envelope)):
+        seconds, content = best_of(repeat, func)
+        report('render', path=path, rows=len(rows), **throughput(seconds, len(content)))
+
+
+def bench_responses(classes, repeat):
+    from django.core.cache import cache
+    from django.test import Client
+
+    client = Client()
+
+    def streamed(encoding):
+        def run():
+            response = client.get('/api/v1/classes/', {'stream': 'true'}, HTTP_ACCEPT_ENCODING=encoding)
+            content = b''.join(response.streaming_content)
+            return response, len(decoded(response, content)), len(content)
+        return run
+
+    def pages(encoding):
+        def run():
+            payload = wire = 0
+            cursor = None
+            while True:
+                # Every page is a cache miss, so it is rendered each time
+                cache.clear()
+                params = {'page_size': 100, **({'cursor': cursor} if cursor else {})}
+                response = client.get('/api/v1/classes/', params, HTTP_ACCEPT_ENCODING=encoding)
+                content = decoded(response, response.content)
+                payload += len(content)
+                wire += len(response.content)
+                cursor = json.loads(content)['next_cursor']
+                if not cursor:
+                    return response, payload, wire
+        return run
+
+    for name, build in (('stream', streamed), ('pages_100', pages)):
+        for encoding in ('identity', 'gzip'):
+            seconds, (response, payload, wire) = best_of(repeat, build(encoding))
+            report(
+                'render',
+                path=f'{name}_{encoding}',
+                rows=classes,
+                content_encoding=response.get('Content-Encoding', 'identity'),
+                **throughput(seconds, payload, wire),
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--classes', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.utils import timezone
+    from booking.models import FitnessClass
+    from booking.serializers import FitnessClassListSerializer
+
+    settings.THROTTLE_RATES = {}
+    start = timezone.now() + timedelta(days=1)
+    FitnessClass.objects.bulk_create(
+        FitnessClass(
+            name=['YOGA', 'ZUMBA', 'HIIT'][n % 3],
+            instructor=f'Instructor {n % 50}',
+            datetime=start + timedelta(minutes=30 * n),
+            total_slots=20,
+            available_slots=n % 21,
+        )
+        for n in range(args.classes)
+    )
+    rows = list(FitnessClass.objects.order_by('datetime', 'id').values(*FitnessClassListSerializer.value_fields))
+
+    bench_renderers(rows, args.repeat)
+    bench_responses(args.classes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Microbenchmark for FitnessClassSerializer(many=True): the bulk list
+serializer against DRF's default ListSerializer, which runs the field
+machinery for every row.
+
+    python -m benchmarks.bench_serializer --classes 5000 --repeat 5
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks._harness import report, setup_django
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--classes', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+    from booking.models import FitnessClass
+    from rest_framework.serializers import ListSerializer
+    from booking.serializers import FitnessClassListSerializer, FitnessClassSerializer
+
+    start = timezone.now() + timedelta(days=1)
+    FitnessClass.objects.bulk_create(
+        FitnessClass(
+            name='YOGA',
+            instructor=f'Instructor {n % 50}',
+            datetime=start + timedelta(minutes=30 * n),
+            total_slots=20,
+            available_slots=n % 21,
+        )
+        for n in range(args.classes)
+    )
+    queryset = FitnessClass.objects.order_by('datetime', 'id')
+    instances = list(queryset)
+    rows = list(queryset.values(*FitnessClassListSerializer.value_fields))
+
+    per_object = best_of(
+        args.repeat,
+        lambda: ListSerializer(instances, child=FitnessClassSerializer()).data,
+    )
+    bulk_instances = best_of(args.repeat, lambda: FitnessClassSerializer(instances, many=True).data)
+    bulk_rows = best_of(args.repeat, lambda: FitnessClassSerializer(rows, many=True).data)
+
+    for mode, seconds in (
+        ('per_object', per_object),
+        ('bulk_instances', bulk_instances),
+        ('bulk_values_rows', bulk_rows),
+    ):
+        report(
+            'serializer',
+            mode=mode,
+            classes=args.classes,
+            seconds=round(seconds, 4),
+            rows_per_sec=round(args.classes / seconds, 1),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Bookings/sec when many clients book one popular class: a single
+available_slots counter against the same capacity split across shards.
+
+    python -m benchmarks.bench_shards --threads 16 --slots 400 --shards 8
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks._harness import report, run_concurrently, setup_django
+from benchmarks.bench_booking import current_book
+
+
+def run(path, threads, slots, shards):
+    from django.db import OperationalError
+    from django.utils import timezone
+    from booking.models import FitnessClass
+
+    fitness_class = FitnessClass.objects.create(
+        name='ZUMBA',
+        instructor='Bench',
+        datetime=timezone.now() + timedelta(days=1),
+        total_slots=slots,
+        available_slots=slots,
+        slot_shards=shards,
+    )
+
+    def worker(n):
+        while True:
+            try:
+                return current_book(fitness_class.id, f'Client {n}', f'client{n}@example.com')
+            except OperationalError:
+                # SQLite reports lock contention instead of blocking; retry
+                continue
+
+    elapsed, results = run_concurrently(worker, range(slots), threads)
+    fitness_class.refresh_from_db()
+    report(
+        'shards',
+        path=path,
+        threads=threads,
+        shards=shards,
+        bookings=sum(results),
+        seconds=round(elapsed, 3),
+        bookings_per_sec=round(sum(results) / elapsed, 1),
+        available_slots=fitness_class.refresh_available_slots(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--slots', type=int, default=400)
+    parser.add_argument('--shards', type=int, default=8)
+    args = parser.parse_args()
+
+    setup_django()
+    run('single_counter', args.threads, args.slots, 0)
+    run('sharded', args.threads, args.slots, args.shards)
+
+
+if __name__ == '__main__':
+    main()
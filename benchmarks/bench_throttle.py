@@ -0,0 +1,77 @@
+"""
+Per-request cost of the token-bucket throttles: the bucket on its own,
+then GET /api/v1/classes/ (served from the listing cache, so throttling
+is a visible share of the work) with throttling switched off and on.
+
+    python -m benchmarks.bench_throttle --requests 5000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks._harness import percentiles, report, setup_django
+
+
+def bench_bucket(requests):
+    from django.core.cache import cache
+    from utils.throttling import TokenBucket
+
+    cache.clear()
+    bucket = TokenBucket('bench', f'{requests * 2}/min')
+    started = time.perf_counter()
+    for n in range(requests):
+        bucket.consume(f'client{n % 100}')
+    elapsed = time.perf_counter() - started
+    report('throttle', path='bucket_consume', requests=requests, us_per_call=round(elapsed / requests * 1e6, 2))
+
+
+def bench_listing(path, rates, requests):
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import Client
+
+    settings.THROTTLE_RATES = rates
+    cache.clear()
+    client = Client()
+    client.get('/api/v1/classes/')
+
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get('/api/v1/classes/')
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    report(
+        'throttle',
+        path=path,
+        requests=requests,
+        mean_ms=round(sum(samples) / requests * 1000, 3),
+        **percentiles(samples),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+    from booking.models import FitnessClass
+
+    for day in range(1, 21):
+        FitnessClass.objects.create(
+            name='YOGA',
+            instructor='Bench',
+            datetime=timezone.now() + timedelta(days=day),
+            total_slots=20,
+            available_slots=20,
+        )
+
+    bench_bucket(args.requests)
+    bench_listing('listing_unthrottled', {}, args.requests)
+    bench_listing('listing_throttled', {'class_list': f'{args.requests * 2}/min'}, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Load runner for the classes/, book/ and bookings/ endpoints.
+
+Seeds a throwaway database with the seed_data command (or reuses an
+existing SQLite file via --db), then drives each endpoint with
+concurrent clients and prints one JSON line per endpoint with
+throughput and p50/p95/p99 latency. Pass --output to append the results,
+tagged with a run label, to a JSON Lines file for comparing runs.
+
+    python -m benchmarks.run_load --classes 5000 --bookings 100000 --threads 8 --requests 2000
+    python -m benchmarks.run_load --base-url http://127.0.0.1:8000 --db db.sqlite3 --skip-seed
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks._harness import percentiles, report, run_concurrently, setup_django
+
+
+class DjangoClientTransport:
+    """
+    In-process requests through Django's test client, one client per thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, params=None, payload=None):
+        from django.test import Client
+
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client()
+        if method == 'GET':
+            response = client.get(path, params or {})
+        else:
+            response = client.post(path, json.dumps(payload), content_type='application/json')
+        return response.status_code
+
+
+class HttpTransport:
+    """
+    Real HTTP requests against a running server.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, params=None, payload=None):
+        url = self.base_url + path
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def scenarios(class_ids, clients):
+    """
+    One request builder per endpoint; each returns (method, path, params, payload).
+    """
+    counter = iter(range(10 ** 12))
+
+    def list_classes(rng):
+        return 'GET', '/api/v1/classes/', {'page_size': rng.choice([20, 50])}, None
+
+    def book(rng):
+        # Fresh emails, so failures are full classes rather than duplicates
+        n = next(counter)
+        return 'POST', '/api/v1/book/', None, {
+            'class_id': rng.choice(class_ids),
+            'client_name': f'Load Client {n}',
+            'client_email': f'load{n}-{rng.random():.6f}@example.com',
+        }
+
+    def bookings(rng):
+        return 'GET', '/api/v1/bookings/', {'email': f'client{rng.randrange(clients)}@example.com'}, None
+
+    def summary(rng):
+        return 'GET', '/api/v1/bookings/summary/', {'email': f'client{rng.randrange(clients)}@example.com'}, None
+
+    return {'classes': list_classes, 'book': book, 'bookings': bookings, 'bookings_summary': summary}
+
+
+def drive(name, build, transport, threads, requests, seed):
+    def worker(n):
+        method, path, params, payload = build(random.Random(seed * 1_000_003 + n))
+        started = time.perf_counter()
+        try:
+            status = transport.request(method, path, params, payload)
+        except Exception:
+            status = None
+        return time.perf_counter() - started, status
+
+    elapsed, results = run_concurrently(worker, range(requests), threads)
+    latencies = [latency for latency, _ in results]
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    return {
+        'endpoint': name,
+        'threads': threads,
+        'requests': requests,
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(requests / elapsed, 1),
+        'errors': errors,
+        'statuses': statuses,
+        **percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='SQLite file to use instead of a throwaway one')
+    parser.add_argument('--skip-seed', action='store_true', help='Use the data already in --db')
+    parser.add_argument('--classes', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=40000)
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint')
+    parser.add_argument('--endpoints', default='classes,book,bookings,bookings_summary')
+    parser.add_argument('--base-url', help='Drive a running server instead of the in-process test client')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--label', default='', help='Run label stored with --output results')
+    parser.add_argument('--output', help='Append results to this JSON Lines file')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.core.management import call_command
+    from booking.models import FitnessClass
+
+    # Measure the endpoints, not the throttles
+    settings.THROTTLE_RATES = {}
+    if not args.skip_seed:
+        call_command(
+            'seed_data',
+            classes=args.classes,
+            bookings=args.bookings,
+            clients=args.clients,
+            seed=args.seed,
+            verbosity=0,
+        )
+
+    class_ids = list(FitnessClass.objects.values_list('id', flat=True))
+    transport = HttpTransport(args.base_url) if args.base_url else DjangoClientTransport()
+    builders = scenarios(class_ids, args.clients)
+
+    results = []
+    for name in args.endpoints.split(','):
+        result = drive(name, builders[name], transport, args.threads, args.requests, args.seed)
+        report('load', **result)
+        results.append(result)
+
+    if args.output:
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(args.output, 'a') as output:
+            for result in results:
+                output.write(json.dumps({'run': args.label, 'at': stamp, **result}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Async (ASGI) versions of the listing, booking and booking-history endpoints.
+
+DRF views are synchronous, so these are plain Django async views that
+reuse the same serializers, pagination and response envelope. Reads go
+through Django's async ORM; the booking transaction runs in a worker
+thread because transaction.atomic() is not available in async code.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+
+from booking import cache as listing_cache
+from booking import events
+from booking.models import FitnessClass
+from booking.serializers import (
+    BookingListSerializer,
+    BookingRequestSerializer,
+    BookingSerializer,
+    FitnessClassListSerializer,
+    FitnessClassSerializer,
+)
+from utils.db_router import client_pin, is_pinned, replica_reads
+from utils.renderers import EnvelopeJSONRenderer
+from utils.response import CustomResponse
+from utils.throttling import (
+    BookingClassThrottle,
+    BookingClientThrottle,
+    ClassListThrottle,
+    check_throttles,
+    retry_after,
+)
+from .booking_views import BookingPagination, booking_history, history_validators, idempotent
+from .class_views import (
+    FitnessClassPagination,
+    listing_validators,
+    materialize_schedules,
+    parse_window,
+    pending_occurrences,
+    upcoming_classes,
+)
+
+
+def render(response):
+    """
+    Render a CustomResponse envelope outside DRF's view machinery.
+    """
+    rendered = HttpResponse(
+        EnvelopeJSONRenderer().render(response.data),
+        content_type="application/json",
+        status=response.status_code,
+    )
+    for header, value in response.items():
+        if header.lower() != "content-type":
+            rendered[header] = value
+    return rendered
+
+
+class AsyncFitnessClassListView(View):
+
+    async def get(self, request, *args, **kwargs):
+        wait = check_throttles(request, [ClassListThrottle])
+        if wait is not None:
+            return render(CustomResponse.throttled_response(retry_after(wait)))
+        try:
+            window = parse_window(request.GET)
+        except ValueError as e:
+            return render(CustomResponse.error_occurred_response(message=str(e)))
+        await sync_to_async(materialize_schedules)()
+
+        key, content, validators = listing_cache.get_listing(request.GET)
+        if content is None:
+            queryset = upcoming_classes(window)
+            with replica_reads(not is_pinned(listing_cache.listing_pin())):
+                pending = await sync_to_async(pending_occurrences)(window)
+                validators = await sync_to_async(listing_validators)(queryset, pending)
+                not_modified = validators.not_modified(request)
+                if not_modified is not None:
+                    return not_modified
+                paginator = FitnessClassPagination()
+                paginator.pending = pending
+                rows = queryset.values(*FitnessClassListSerializer.value_fields)
+                try:
+                    page = await paginator.apaginate_queryset(rows, request)
+                except NotFound as e:
+                    return render(CustomResponse.not_found_response(message=str(e.detail)))
+                # Sharded classes read their shard sums, so encode in a worker thread
+                encoded = await sync_to_async(FitnessClassSerializer(many=True).to_json)(page)
+            envelope = paginator.get_paginated_response(encoded).data
+            envelope["count"] = len(page)
+            content = EnvelopeJSONRenderer().render(envelope)
+            listing_cache.set_listing(key, content, validators)
+        else:
+            not_modified = validators.not_modified(request)
+            if not_modified is not None:
+                return not_modified
+        return validators.apply(HttpResponse(content, content_type="application/json"))
+
+
+class AsyncBookClassView(View):
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return render(CustomResponse.error_occurred_response(message="Request body must be JSON."))
+
+        wait = check_throttles(request, [BookingClientThrottle, BookingClassThrottle], payload)
+        if wait is not None:
+            return render(CustomResponse.throttled_response(retry_after(wait)))
+
+        key = request.headers.get('Idempotency-Key')
+        return render(await sync_to_async(idempotent)(key, payload, lambda: self.book(payload)))
+
+    @staticmethod
+    def book(payload):
+        """
+        Validate and reserve in one worker thread, so the reservation's
+        transaction stays on a single connection.
+        """
+        serializer = BookingRequestSerializer(data=payload)
+        if not serializer.is_valid():
+            return CustomResponse.error_occurred_response(
+                message="Invalid booking data.",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            booking = serializer.save()
+        except IntegrityError:
+            return CustomResponse.error_occurred_response(
+                message="You have already booked this class.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        except ValidationError as e:
+            return CustomResponse.error_occurred_response(
+                message=str(e.detail[0]),
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return CustomResponse.create_response(
+            data=BookingSerializer(booking).data,
+            message="Booking successful!"
+        )
+
+
+class AsyncGetBookingsView(View):
+
+    async def get(self, request, *args, **kwargs):
+        email = request.GET.get('email', '').strip()
+        if not email:
+            return render(CustomResponse.error_occurred_response(
+                message="Email query parameter is required.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            ))
+
+        try:
+            bookings = booking_history(email, request.GET)
+        except ValueError as e:
+            return render(CustomResponse.error_occurred_response(message=str(e)))
+        paginator = BookingPagination()
+        try:
+            with replica_reads(not is_pinned(client_pin(email))):
+                page = await paginator.apaginate_queryset(bookings, request)
+                shard_availability = await sync_to_async(BookingListSerializer.load_shard_availability)(page)
+        except NotFound as e:
+            return render(CustomResponse.not_found_response(message=str(e.detail)))
+        validators = history_validators(page, shard_availability)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        # fitness_class is already joined and the shard sums are loaded
+        data = BookingSerializer(page, many=True, context={'shard_availability': shard_availability}).data
+        return validators.apply(render(paginator.get_paginated_response(data)))
+
+
+class ClassAvailabilityStreamView(View):
+    """
+    Server-Sent Events stream of one class's slot counts. The current
+    count is sent first, then every change pushed through the broker,
+    with a comment line as keep-alive while nothing changes.
+
+    ASGI only: under WSGI Django collects an async stream into a list
+    before sending it, so an endless stream would hold a worker forever.
+    """
+
+    async def get(self, request, pk, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return render(CustomResponse.error_occurred_response(
+                message="Availability streams need an ASGI server.",
+                status_code=status.HTTP_501_NOT_IMPLEMENTED
+            ))
+        if not await FitnessClass.objects.filter(pk=pk).aexists():
+            return render(CustomResponse.not_found_response(message="Fitness class not found."))
+
+        response = StreamingHttpResponse(self.stream(pk), content_type="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        # Stop reverse proxies from buffering the stream
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, pk):
+        subscription = events.broker.subscribe(events.class_channel(pk))
+        try:
+            # Read the snapshot after subscribing so no change falls in between;
+            # the response only starts this generator once it is sent
+            fitness_class = await FitnessClass.objects.filter(pk=pk).afirst()
+            if fitness_class is None:
+                return
+            snapshot = await sync_to_async(events.availability)(fitness_class)
+            yield self.event(snapshot)
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.get(), timeout=settings.CLASS_STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield self.event(message)
+        finally:
+            subscription.close()
+
+    @staticmethod
+    def event(data):
+        return f"event: availability\ndata: {json.dumps(data)}\n\n"
@@ -1,27 +1,167 @@
+from datetime import timedelta
+
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from django.conf import settings
 from django.db import transaction, IntegrityError
-from booking.models import Booking
-from booking.serializers import BookingRequestSerializer, BookingSerializer
+from django.utils import timezone
+from booking.models import Booking, FitnessClass, IdempotencyKey
+from booking.serializers import (
+    BatchBookingRequestSerializer,
+    BookingListSerializer,
+    BookingRequestSerializer,
+    BookingSerializer,
+)
+from utils.conditional import Validators
+from utils.db_router import client_pin, is_pinned, replica_reads
+from utils.metrics import track_serializer
+from utils.pagination import KeysetPagination
 from utils.response import CustomResponse  # import your custom response class
+from utils.throttling import BookingClassThrottle, BookingClientThrottle, FirstDenialMixin
+from .class_views import parse_window
+
+
+class BookingPagination(KeysetPagination):
+    ordering = ("-booked_at", "-id")
+
+
+def booking_history(email, params):
+    """
+    A client's bookings narrowed by the optional when (upcoming/past),
+    from/to (booking date) and class_type filters.
+    """
+    bookings = Booking.objects.for_email(email).select_related('fitness_class')
+
+    when = params.get('when', '').lower()
+    if when == 'upcoming':
+        bookings = bookings.filter(fitness_class__datetime__gt=timezone.now())
+    elif when == 'past':
+        bookings = bookings.filter(fitness_class__datetime__lte=timezone.now())
+    elif when:
+        raise ValueError("'when' must be 'upcoming' or 'past'.")
+
+    start, end = parse_window(params)
+    if start:
+        bookings = bookings.filter(booked_at__gte=start)
+    if end:
+        bookings = bookings.filter(booked_at__lt=end)
+
+    class_type = params.get('class_type', '').upper()
+    if class_type:
+        if class_type not in dict(FitnessClass.CLASS_TYPES):
+            raise ValueError(f"Unknown class_type '{class_type}'.")
+        bookings = bookings.filter(fitness_class__name=class_type)
+    return bookings
+
+
+def history_validators(page, shard_availability=None):
+    """
+    Validators for one page of booking history, taken from the fetched
+    rows themselves: the ids catch new and cancelled bookings, the newest
+    booking or class updated_at catches changed details. Shard claims
+    touch neither row, so the shard sums of sharded classes go in too.
+    """
+    last_modified = max(
+        (max(booking.updated_at, booking.fitness_class.updated_at) for booking in page),
+        default=None,
+    )
+    return Validators.from_parts(
+        *(booking.id for booking in page),
+        *sorted((shard_availability or {}).items()),
+        last_modified,
+        last_modified=last_modified,
+    )
 
-class BookClassView(generics.CreateAPIView):
+def idempotent(key, payload, perform, scope="book"):
+    """
+    Run ``perform`` at most once per Idempotency-Key.
+
+    A successful response is stored in the same transaction as the
+    booking it reports, so a retry replays it after one indexed lookup
+    without validating or touching the class again. The key is claimed
+    before ``perform`` runs, so a concurrent retry that missed the lookup
+    waits on the claim and then replays instead of booking twice. Failed
+    requests changed nothing and release the key; retrying them simply
+    runs again.
+    """
+    if not key:
+        return perform()
+    if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        return CustomResponse.error_occurred_response(message="Idempotency-Key is too long.")
+
+    fingerprint = IdempotencyKey.fingerprint_of(payload)
+    stored = IdempotencyKey.objects.lookup(scope, key)
+    if stored is None:
+        try:
+            with transaction.atomic():
+                claim = IdempotencyKey.objects.create(
+                    scope=scope,
+                    key=key,
+                    fingerprint=fingerprint,
+                    status_code=0,
+                    response={},
+                    expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+                response = perform()
+                if response.status_code < 400:
+                    claim.status_code = response.status_code
+                    claim.response = response.data
+                    claim.save(update_fields=['status_code', 'response'])
+                else:
+                    claim.delete()
+            return response
+        except IntegrityError:
+            # A concurrent request with the same key claimed it first
+            stored = IdempotencyKey.objects.lookup(scope, key)
+            if stored is None:
+                raise
+
+    if stored.fingerprint != fingerprint:
+        return CustomResponse.error_occurred_response(
+            message="Idempotency-Key was already used for a different request.",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+class BookClassView(FirstDenialMixin, generics.CreateAPIView):
     serializer_class = BookingRequestSerializer
+    throttle_classes = [BookingClientThrottle, BookingClassThrottle]
+
+    idempotency_key_param = openapi.Parameter(
+        'Idempotency-Key',
+        openapi.IN_HEADER,
+        description="Client-chosen key; retries with the same key replay the first successful response",
+        type=openapi.TYPE_STRING
+    )
 
     @swagger_auto_schema(
         request_body=BookingRequestSerializer,
+        manual_parameters=[idempotency_key_param],
         responses={
             201: "Booking successful",
-            400: "Invalid booking data or duplicate booking"
+            400: "Invalid booking data or duplicate booking",
+            422: "Idempotency-Key reused for a different request",
+            429: "Too many booking attempts for this client or class"
         }
     )
     def post(self, request, *args, **kwargs):
+        return idempotent(
+            request.headers.get('Idempotency-Key'),
+            request.data,
+            lambda: self.book(request)
+        )
+
+    def book(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             try:
                 booking = serializer.save()
-                booking_data = BookingSerializer(booking).data
+                with track_serializer():
+                    booking_data = BookingSerializer(booking).data
                 return CustomResponse.create_response(
                     data=booking_data,
                     message="Booking successful!"
@@ -31,10 +171,10 @@ class BookClassView(generics.CreateAPIView):
                     message="You have already booked this class.",
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
-            except serializer.ValidationError as e:
+            except ValidationError as e:
                 # To handle ValidationError raised inside create()
                 return CustomResponse.error_occurred_response(
-                    message=str(e),
+                    message=str(e.detail[0]),
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
         return CustomResponse.error_occurred_response(
@@ -43,8 +183,48 @@ class BookClassView(generics.CreateAPIView):
             status_code=status.HTTP_400_BAD_REQUEST
         )
 
+class BatchBookClassView(generics.CreateAPIView):
+    serializer_class = BatchBookingRequestSerializer
+
+    @swagger_auto_schema(
+        request_body=BatchBookingRequestSerializer,
+        responses={
+            201: "Bookings created, with a result per item",
+            400: "Invalid batch data, or no item could be booked"
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return CustomResponse.error_occurred_response(
+                message="Invalid batch booking data.",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result = serializer.save()
+        except ValidationError as e:
+            # A sharded class was filled by concurrent single bookings
+            return CustomResponse.error_occurred_response(
+                message=str(e.detail[0]),
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        if not result['booked']:
+            return CustomResponse.error_occurred_response(
+                message="No bookings were made.",
+                errors=result['results'],
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return CustomResponse.create_response(
+            data=result,
+            message=f"{result['booked']} booking(s) successful."
+        )
+
 class GetBookingsView(generics.ListAPIView):
     serializer_class = BookingSerializer
+    pagination_class = BookingPagination
+    shard_availability = None
 
     email_param = openapi.Parameter(
         'email',
@@ -53,6 +233,78 @@ class GetBookingsView(generics.ListAPIView):
         type=openapi.TYPE_STRING,
         required=True
     )
+    when_param = openapi.Parameter(
+        'when',
+        openapi.IN_QUERY,
+        description="upcoming or past, by class time",
+        type=openapi.TYPE_STRING
+    )
+    from_param = openapi.Parameter(
+        'from',
+        openapi.IN_QUERY,
+        description="First booking day (YYYY-MM-DD, studio time)",
+        type=openapi.TYPE_STRING
+    )
+    to_param = openapi.Parameter(
+        'to',
+        openapi.IN_QUERY,
+        description="Last booking day (YYYY-MM-DD, studio time)",
+        type=openapi.TYPE_STRING
+    )
+    class_type_param = openapi.Parameter(
+        'class_type',
+        openapi.IN_QUERY,
+        description="YOGA, ZUMBA or HIIT",
+        type=openapi.TYPE_STRING
+    )
+    cursor_param = openapi.Parameter(
+        'cursor',
+        openapi.IN_QUERY,
+        description="Cursor returned as next_cursor by the previous page",
+        type=openapi.TYPE_STRING
+    )
+
+    def get_serializer_context(self):
+        # The shard sums read for the ETag are reused by the serializer
+        return {**super().get_serializer_context(), 'shard_availability': self.shard_availability}
+
+    @swagger_auto_schema(manual_parameters=[
+        email_param, when_param, from_param, to_param, class_type_param, cursor_param
+    ])
+    def get(self, request, *args, **kwargs):
+        email = request.query_params.get('email', '').strip()
+        if not email:
+            return CustomResponse.error_occurred_response(
+                message="Email query parameter is required.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            bookings = booking_history(email, request.query_params)
+        except ValueError as e:
+            return CustomResponse.error_occurred_response(message=str(e))
+        # The page is evaluated first so the query is not counted as serializer time
+        with replica_reads(not is_pinned(client_pin(email))):
+            page = self.paginate_queryset(bookings)
+            self.shard_availability = BookingListSerializer.load_shard_availability(page)
+        validators = history_validators(page, self.shard_availability)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(page, many=True)
+        with track_serializer():
+            data = serializer.data
+        return validators.apply(self.get_paginated_response(data))
+
+
+class BookingSummaryView(APIView):
+
+    email_param = openapi.Parameter(
+        'email',
+        openapi.IN_QUERY,
+        description="Email address to summarize bookings for",
+        type=openapi.TYPE_STRING,
+        required=True
+    )
 
     @swagger_auto_schema(manual_parameters=[email_param])
     def get(self, request, *args, **kwargs):
@@ -62,6 +314,52 @@ class GetBookingsView(generics.ListAPIView):
                 message="Email query parameter is required.",
                 status_code=status.HTTP_400_BAD_REQUEST
             )
-        bookings = Booking.objects.filter(client_email__iexact=email)
-        serializer = self.get_serializer(bookings, many=True)
-        return CustomResponse.list_response(serializer.data, message=f"Bookings for {email}")
+        with replica_reads(not is_pinned(client_pin(email))):
+            summary = Booking.objects.for_email(email).summary()
+        return CustomResponse.single_item_response(summary, message=f"Booking summary for {email}")
+
+
+class CancelBookingView(generics.DestroyAPIView):
+    serializer_class = BookingSerializer
+    queryset = Booking.objects.all()
+
+    email_param = openapi.Parameter(
+        'email',
+        openapi.IN_QUERY,
+        description="Email address the booking was made with",
+        type=openapi.TYPE_STRING,
+        required=True
+    )
+
+    @swagger_auto_schema(
+        manual_parameters=[email_param],
+        responses={
+            204: "Booking cancelled",
+            400: "Missing email or class already started",
+            404: "Booking not found"
+        }
+    )
+    def delete(self, request, pk, *args, **kwargs):
+        email = request.query_params.get('email', '').strip()
+        if not email:
+            return CustomResponse.error_occurred_response(
+                message="Email query parameter is required.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        booking = (
+            Booking.objects.for_email(email)
+            .select_related('fitness_class')
+            .filter(id=pk)
+            .first()
+        )
+        if booking is None:
+            return CustomResponse.not_found_response(message="Booking not found.")
+        if booking.fitness_class.datetime <= timezone.now():
+            return CustomResponse.error_occurred_response(
+                message="Cannot cancel a class that has already started or finished.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        if not booking.cancel():
+            # A concurrent request cancelled it first
+            return CustomResponse.not_found_response(message="Booking not found.")
+        return CustomResponse.delete_response(message="Booking cancelled.")
@@ -1,23 +1,418 @@
-from rest_framework import generics
+import io
+from datetime import datetime, time, timedelta
+from heapq import merge
+from itertools import islice
+
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse
 from django.utils import timezone
-from booking.models import FitnessClass
-from booking.serializers import FitnessClassSerializer
+from django.utils.dateparse import parse_date
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from booking import cache as listing_cache
+from booking.importers import ClassImporter
+from booking.models import ClassSchedule, FitnessClass, SlotShard
+from booking.serializers import FitnessClassListSerializer, FitnessClassSerializer
+from utils.conditional import Validators
+from utils.db_router import is_pinned, replica_reads
+from utils.metrics import track_serializer
+from utils.pagination import KeysetPagination
+from utils.renderers import EnvelopeJSONRenderer
 from utils.response import  CustomResponse
+from utils.throttling import ClassListThrottle
+
+
+class FitnessClassPagination(KeysetPagination):
+    ordering = ("datetime", "id")
+    # Unsaved scheduled occurrences to merge into the saved rows
+    pending = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.page_from(self.merge_pending(list(self.seek(queryset, request)), request))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.page_from(self.merge_pending([row async for row in self.seek(queryset, request)], request))
+
+    def merge_pending(self, rows, request):
+        """
+        Merge the pending occurrences after the cursor into the saved rows
+        of a page, keeping the extra row that signals a next page.
+        """
+        if not self.pending:
+            return rows
+        cursor = self._query_params(request).get(self.cursor_query_param)
+        after = tuple(self.decode_cursor(cursor, FitnessClass)) if cursor else None
+        pending = [item for item in self.pending if after is None or self.sort_key(item) > after]
+        return sorted(rows + pending, key=self.sort_key)[:self.page_size + 1]
+
+    @classmethod
+    def sort_key(cls, item):
+        return tuple(cls._position(item, field) for field in cls.ordering)
+
+    @staticmethod
+    def _position(item, name):
+        value = KeysetPagination._position(item, name)
+        if name == "id" and value is None:
+            # Unsaved occurrences have no id; they sort by schedule, ahead
+            # of the saved classes at the same time
+            return -KeysetPagination._position(item, "schedule_id")
+        return value
+
+
+class ClassChangesPagination(KeysetPagination):
+    ordering = ("updated_at", "id")
+    cursor_query_param = "since"
+
+    def paginate_changes(self, request):
+        """
+        One page of class changes after the ``since`` cursor, oldest first.
+
+        Changes come from two indexed range scans, one over class rows and
+        one over slot shards, because shard claims do not touch the class
+        row. Both are cut at page_size + 1, merged as (changed_at, id)
+        events and each changed class is returned once with its current
+        state. The cursor is that of the last event, or the incoming one
+        when nothing changed, so clients can always poll with it.
+
+        Only changes older than CLASS_CHANGES_SAFETY_LAG_SECONDS are
+        reported: a transaction still in flight may commit a slightly
+        older updated_at, and the cursor must not have passed it by then.
+        """
+        params = self._query_params(request)
+        self.page_size = self.get_page_size(request)
+        cursor = params.get(self.cursor_query_param)
+        since = self.decode_cursor(cursor, FitnessClass) if cursor else None
+        settled = timezone.now() - timedelta(seconds=settings.CLASS_CHANGES_SAFETY_LAG_SECONDS)
+
+        classes = FitnessClass.objects.filter(updated_at__lte=settled).order_by(*self.ordering)
+        shards = SlotShard.objects.filter(updated_at__lte=settled).order_by()
+        if since:
+            classes = classes.filter(self.seek_filter(since))
+            shards = shards.filter(updated_at__gte=since[0])
+        events = list(classes.values_list("updated_at", "id")[:self.page_size + 1])
+        events += [
+            event for event in
+            shards.values("fitness_class_id")
+            .annotate(changed_at=Max("updated_at"))
+            .order_by("changed_at", "fitness_class_id")
+            .values_list("changed_at", "fitness_class_id")[:self.page_size + 1]
+            if since is None or tuple(event) > tuple(since)
+        ]
+        events = sorted(events)[:self.page_size]
+
+        self.next_cursor = (
+            self.encode_cursor({"updated_at": events[-1][0], "id": events[-1][1]})
+            if events else cursor
+        )
+        changed = list(dict.fromkeys(class_id for _, class_id in events))
+        rows = {
+            row["id"]: row for row in
+            FitnessClass.objects.filter(id__in=changed).values(*FitnessClassListSerializer.value_fields)
+        }
+        return [rows[class_id] for class_id in changed if class_id in rows]
+
+
+def parse_window(params):
+    """
+    Parse the optional from/to dates into [start, end) datetimes.
+    """
+    window = []
+    for name, days in (('from', 0), ('to', 1)):
+        value = params.get(name)
+        try:
+            day = parse_date(value) if value else None
+        except ValueError:
+            day = None
+        if value and day is None:
+            raise ValueError(f"'{name}' must be a date in YYYY-MM-DD format.")
+        window.append(
+            timezone.make_aware(datetime.combine(day + timedelta(days=days), time.min))
+            if day else None
+        )
+    return tuple(window)
+
+
+def materialize_schedules():
+    """
+    Make sure recurring schedules have rows up to the rolling horizon.
+    """
+    ClassSchedule.objects.materialize(timezone.now() + timedelta(days=settings.CLASS_SCHEDULE_HORIZON_DAYS))
+
+
+def pending_occurrences(window):
+    """
+    Scheduled occurrences in the window past the materialized horizon,
+    as unsaved rows in listing order; listing them persists nothing. A
+    window with only a start reaches one horizon beyond it.
+    """
+    now = timezone.now()
+    horizon = timedelta(days=settings.CLASS_SCHEDULE_HORIZON_DAYS)
+    start, end = window
+    if end is None:
+        end = start + horizon if start else now
+    end = min(end, now + timedelta(days=settings.CLASS_SCHEDULE_MAX_WINDOW_DAYS))
+    start = max(start or now, ClassSchedule.objects.day_after(now + horizon))
+    if start >= end:
+        return []
+    return sorted(ClassSchedule.objects.pending(start, end), key=FitnessClassPagination.sort_key)
+
+
+def listing_validators(queryset, pending=()):
+    """
+    Validators for a class listing from one aggregate: the row count
+    catches classes appearing or dropping out, the newest class or shard
+    updated_at catches any change to a listed row. Pending occurrences
+    add their number and their schedules' newest updated_at.
+
+    Only the ETag is sent. A Last-Modified date has whole-second
+    resolution and cannot move forward when a class drops out, so
+    If-Modified-Since would answer 304 for a listing that changed.
+    """
+    stamp = queryset.aggregate(
+        count=Count('id', distinct=True),
+        last=Max('updated_at'),
+        shards_last=Max('shards__updated_at'),
+    )
+    scheduled = max((occurrence.schedule.updated_at for occurrence in pending), default=None)
+    last_modified = max(filter(None, (stamp['last'], stamp['shards_last'], scheduled)), default=None)
+    return Validators.from_parts(stamp['count'], len(pending), last_modified)
+
+
+def upcoming_classes(window=(None, None)):
+    queryset = FitnessClass.objects.filter(datetime__gt=timezone.now())
+    start, end = window
+    if start:
+        queryset = queryset.filter(datetime__gte=start)
+    if end:
+        queryset = queryset.filter(datetime__lt=end)
+    return queryset.order_by("datetime", "id")
+
 
 class FitnessClassListCreateView(generics.ListCreateAPIView):
     serializer_class = FitnessClassSerializer
+    pagination_class = FitnessClassPagination
+    stream_chunk_size = 500
+
+    cursor_param = openapi.Parameter(
+        'cursor',
+        openapi.IN_QUERY,
+        description="Cursor returned as next_cursor by the previous page",
+        type=openapi.TYPE_STRING
+    )
+    page_size_param = openapi.Parameter(
+        'page_size',
+        openapi.IN_QUERY,
+        description="Number of classes per page",
+        type=openapi.TYPE_INTEGER
+    )
+    stream_param = openapi.Parameter(
+        'stream',
+        openapi.IN_QUERY,
+        description="Stream every upcoming class in one response instead of paginating",
+        type=openapi.TYPE_BOOLEAN
+    )
+    from_param = openapi.Parameter(
+        'from',
+        openapi.IN_QUERY,
+        description="First day of the window (YYYY-MM-DD, studio time)",
+        type=openapi.TYPE_STRING
+    )
+    to_param = openapi.Parameter(
+        'to',
+        openapi.IN_QUERY,
+        description="Last day of the window (YYYY-MM-DD, studio time)",
+        type=openapi.TYPE_STRING
+    )
+    window = (None, None)
+
+    def get_throttles(self):
+        if self.request.method == 'GET':
+            return [ClassListThrottle()]
+        return super().get_throttles()
 
     def get_queryset(self):
-        return FitnessClass.objects.filter(datetime__gt=timezone.now()).order_by("datetime")
+        return upcoming_classes(self.window)
+
+    @swagger_auto_schema(manual_parameters=[cursor_param, page_size_param, stream_param, from_param, to_param])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def list(self, request, *args, **kwargs):
+        try:
+            self.window = parse_window(request.query_params)
+        except ValueError as e:
+            return CustomResponse.error_occurred_response(message=str(e))
+        materialize_schedules()
+
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return CustomResponse.list_response(serializer.data)
+        if request.query_params.get('stream', '').lower() in ('1', 'true'):
+            return self.stream(queryset, pending_occurrences(self.window))
+
+        # Only JSON clients share the cache; the browsable API renders normally
+        if not isinstance(request.accepted_renderer, EnvelopeJSONRenderer):
+            return self.page_response(queryset, pending_occurrences(self.window))
+
+        key, content, validators = listing_cache.get_listing(request.query_params)
+        if content is None:
+            with replica_reads(not is_pinned(listing_cache.listing_pin())):
+                pending = pending_occurrences(self.window)
+                validators = listing_validators(queryset, pending)
+                not_modified = validators.not_modified(request)
+                if not_modified is not None:
+                    return not_modified
+                response = self.page_response(queryset, pending, encoded=True)
+            content = request.accepted_renderer.render(response.data)
+            listing_cache.set_listing(key, content, validators)
+        else:
+            # A cached page's validators stay valid until the version bumps
+            not_modified = validators.not_modified(request)
+            if not_modified is not None:
+                return not_modified
+        return validators.apply(HttpResponse(content, content_type=request.accepted_renderer.media_type))
+
+    def page_response(self, queryset, pending=(), encoded=False):
+        """
+        One page of the listing, with the pending occurrences merged in.
+        With ``encoded`` the rows come back as RawJSON for
+        EnvelopeJSONRenderer, skipping the intermediate dicts.
+        """
+        # Page over plain rows; the bulk list serializer needs no instances
+        rows = queryset.values(*FitnessClassListSerializer.value_fields)
+        self.paginator.pending = pending
+        page = self.paginate_queryset(rows)
+        serializer = self.get_serializer(page, many=True)
+        with track_serializer():
+            data = serializer.to_json(page) if encoded else serializer.data
+        response = self.get_paginated_response(data)
+        if encoded:
+            # The count of a RawJSON list is the page's length
+            response.data["count"] = len(page)
+        return response
+
+    def stream(self, queryset, pending=()):
+        """
+        Serialize rows from a server-side cursor as they are read,
+        one bulk-serialized chunk at a time, merged in order with the
+        pending occurrences.
+        """
+        serializer = self.get_serializer(many=True)
+        rows = merge(
+            queryset.values(*FitnessClassListSerializer.value_fields).iterator(chunk_size=self.stream_chunk_size),
+            pending,
+            key=FitnessClassPagination.sort_key,
+        )
+
+        def encoded_chunks():
+            while True:
+                chunk = list(islice(rows, self.stream_chunk_size))
+                if not chunk:
+                    return
+                yield serializer.encode_rows(chunk)
+
+        return CustomResponse.stream_encoded_list_response(encoded_chunks())
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             self.perform_create(serializer)
             return CustomResponse.create_response(serializer.data)
-        return CustomResponse.error_occurred_response(errors=serializer.errors)
\ No newline at end of file
+        return CustomResponse.error_occurred_response(errors=serializer.errors)
+
+
+class FitnessClassChangesView(APIView):
+
+    since_param = openapi.Parameter(
+        'since',
+        openapi.IN_QUERY,
+        description="Cursor returned as next_cursor by the previous poll; omit to start from the beginning",
+        type=openapi.TYPE_STRING
+    )
+    page_size_param = openapi.Parameter(
+        'page_size',
+        openapi.IN_QUERY,
+        description="Maximum number of changes per response",
+        type=openapi.TYPE_INTEGER
+    )
+
+    @swagger_auto_schema(manual_parameters=[since_param, page_size_param])
+    def get(self, request, *args, **kwargs):
+        """
+        Classes whose slots or details changed after the cursor. A full
+        page means more changes are waiting; poll again with next_cursor.
+        """
+        paginator = ClassChangesPagination()
+        try:
+            rows = paginator.paginate_changes(request)
+        except NotFound as e:
+            return CustomResponse.not_found_response(message=str(e.detail))
+        with track_serializer():
+            data = FitnessClassSerializer(rows, many=True).data
+        return paginator.get_paginated_response(data)
+
+
+class FitnessClassImportView(APIView):
+    parser_classes = [MultiPartParser]
+
+    file_param = openapi.Parameter(
+        'file',
+        openapi.IN_FORM,
+        description="CSV or JSON Lines file with name, instructor, datetime and total_slots",
+        type=openapi.TYPE_FILE,
+        required=True
+    )
+    format_param = openapi.Parameter(
+        'format',
+        openapi.IN_FORM,
+        description="csv or jsonl; defaults to the file extension",
+        type=openapi.TYPE_STRING
+    )
+    batch_size_param = openapi.Parameter(
+        'batch_size',
+        openapi.IN_FORM,
+        description="Rows per bulk insert",
+        type=openapi.TYPE_INTEGER
+    )
+
+    @swagger_auto_schema(
+        manual_parameters=[file_param, format_param, batch_size_param],
+        responses={
+            201: "Import report with per-row errors",
+            400: "Missing file, unknown format or no valid rows"
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return CustomResponse.error_occurred_response(message="A file upload is required.")
+
+        fmt = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        if fmt not in ClassImporter.FORMATS:
+            return CustomResponse.error_occurred_response(message="Format must be csv or jsonl.")
+        try:
+            batch_size = int(request.data.get('batch_size', 1000))
+        except ValueError:
+            batch_size = 0
+        if batch_size <= 0:
+            return CustomResponse.error_occurred_response(message="batch_size must be a positive integer.")
+
+        # Decode the upload lazily; large uploads stay in their temporary file.
+        # utf-8-sig drops the byte-order mark spreadsheet exports start with.
+        upload.seek(0)
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = ClassImporter(batch_size=batch_size).run(stream, fmt)
+
+        if not report['created'] and report['failed']:
+            return CustomResponse.error_occurred_response(
+                message="No classes were imported.",
+                errors=report,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return CustomResponse.create_response(
+            data=report,
+            message=f"Imported {report['created']} classes."
+        )
@@ -1,15 +1,44 @@
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from .async_views import (
+    AsyncBookClassView,
+    ClassAvailabilityStreamView,
+    AsyncFitnessClassListView,
+    AsyncGetBookingsView,
+)
 from .booking_views import (
+    BatchBookClassView,
     BookClassView,
+    BookingSummaryView,
+    CancelBookingView,
     GetBookingsView,
 )
 from .class_views import (
+    FitnessClassChangesView,
+    FitnessClassImportView,
     FitnessClassListCreateView,
 )
+from .schedule_views import (
+    ClassScheduleListCreateView,
+)
+from .waitlist_views import (
+    WaitlistView,
+)
 
 
 urlpatterns = [
     path("classes/", FitnessClassListCreateView.as_view(), name="fitness-classes"),
+    path("classes/changes/", FitnessClassChangesView.as_view(), name="class-changes"),
+    path("classes/<int:pk>/stream/", ClassAvailabilityStreamView.as_view(), name="class-stream"),
+    path("classes/import/", FitnessClassImportView.as_view(), name="import-classes"),
+    path("schedules/", ClassScheduleListCreateView.as_view(), name="class-schedules"),
     path("book/", BookClassView.as_view(), name="book-class"),
+    path("book/batch/", BatchBookClassView.as_view(), name="book-class-batch"),
     path("bookings/", GetBookingsView.as_view(), name="get-bookings"),
+    path("bookings/summary/", BookingSummaryView.as_view(), name="booking-summary"),
+    path("bookings/<int:pk>/", CancelBookingView.as_view(), name="cancel-booking"),
+    path("waitlist/", WaitlistView.as_view(), name="waitlist"),
+    path("async/classes/", AsyncFitnessClassListView.as_view(), name="async-fitness-classes"),
+    path("async/book/", csrf_exempt(AsyncBookClassView.as_view()), name="async-book-class"),
+    path("async/bookings/", AsyncGetBookingsView.as_view(), name="async-get-bookings"),
 ]
@@ -0,0 +1,23 @@
+from rest_framework import generics
+from booking.models import ClassSchedule
+from booking.serializers import ClassScheduleSerializer
+from utils.response import CustomResponse
+
+
+class ClassScheduleListCreateView(generics.ListCreateAPIView):
+    serializer_class = ClassScheduleSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        return ClassSchedule.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return CustomResponse.list_response(serializer.data)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if serializer.is_valid():
+            self.perform_create(serializer)
+            return CustomResponse.create_response(serializer.data)
+        return CustomResponse.error_occurred_response(errors=serializer.errors)
@@ -0,0 +1,61 @@
+from rest_framework import generics, status
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from django.db import IntegrityError
+from booking.models import WaitlistEntry
+from booking.serializers import WaitlistEntrySerializer, WaitlistRequestSerializer
+from utils.response import CustomResponse
+
+
+class WaitlistView(generics.ListCreateAPIView):
+    serializer_class = WaitlistRequestSerializer
+    pagination_class = None
+
+    email_param = openapi.Parameter(
+        'email',
+        openapi.IN_QUERY,
+        description="Email address to list waitlist entries for",
+        type=openapi.TYPE_STRING,
+        required=True
+    )
+
+    @swagger_auto_schema(manual_parameters=[email_param], responses={200: WaitlistEntrySerializer(many=True)})
+    def get(self, request, *args, **kwargs):
+        email = request.query_params.get('email', '').strip()
+        if not email:
+            return CustomResponse.error_occurred_response(
+                message="Email query parameter is required.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        entries = WaitlistEntry.objects.for_email(email)
+        return CustomResponse.list_response(
+            WaitlistEntrySerializer(entries, many=True).data,
+            message=f"Waitlist entries for {email}"
+        )
+
+    @swagger_auto_schema(
+        request_body=WaitlistRequestSerializer,
+        responses={
+            201: "Joined the waitlist",
+            400: "Invalid data, class not full, or already waiting"
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return CustomResponse.error_occurred_response(
+                message="Invalid waitlist data.",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            entry = serializer.save()
+        except IntegrityError:
+            return CustomResponse.error_occurred_response(
+                message="You are already on the waitlist for this class.",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return CustomResponse.create_response(
+            data=WaitlistEntrySerializer(entry).data,
+            message="Added to the waitlist."
+        )
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class BookingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'booking'
+
+    def ready(self):
+        # Importing metrics hooks the query counter into every new connection
+        from utils import logs, metrics
+        from booking import cache
+
+        metrics.registry.register_collector(cache.exposition_lines)
+        metrics.registry.register_collector(logs.exposition_lines)
@@ -0,0 +1,122 @@
+"""
+Versioned read-through cache for the upcoming-classes listing.
+
+Rendered pages are stored under the current listing version. Writes that
+change a class bump the version, which orphans every cached page at once
+instead of deleting keys one by one; orphans expire through their timeout.
+"""
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from utils.db_router import pin_to_primary
+
+# There is no studio model yet, so every class shares one version scope
+DEFAULT_SCOPE = "all"
+
+
+class CacheStats:
+    """
+    In-process hit/miss counters for the listing cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+stats = CacheStats()
+
+
+def exposition_lines():
+    """
+    Hit/miss counters in the Prometheus text format.
+    """
+    snapshot = stats.snapshot()
+    lines = []
+    for result in ("hits", "misses"):
+        name = f"booking_class_list_cache_{result}_total"
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {snapshot[result]}")
+    return lines
+
+
+def _version_key(scope):
+    return f"classes:version:{scope}"
+
+
+def get_version(scope=DEFAULT_SCOPE):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope=DEFAULT_SCOPE):
+    key = _version_key(scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        return cache.incr(key)
+
+
+def invalidate_listing(scope=DEFAULT_SCOPE):
+    """
+    Bump the listing version once the current transaction commits, so no
+    reader can cache pre-commit data under the new version. Until the
+    replicas catch up, pages are rebuilt from the primary.
+    """
+    transaction.on_commit(lambda: bump_version(scope))
+    pin_to_primary(listing_pin(scope))
+
+
+def listing_pin(scope=DEFAULT_SCOPE):
+    return f"classes:{scope}"
+
+
+def _page_key(version, params, scope):
+    query = hashlib.md5(urlencode(sorted(params.items())).encode()).hexdigest()
+    return f"classes:list:{scope}:{version}:{query}"
+
+
+def get_listing(params, scope=DEFAULT_SCOPE):
+    """
+    Return (key, content, validators); content is the cached JSON bytes
+    and validators its conditional GET validators, both None on a miss.
+    """
+    key = _page_key(get_version(scope), params, scope)
+    entry = cache.get(key)
+    stats.record(entry is not None)
+    if entry is None:
+        return key, None, None
+    return key, *entry
+
+
+def set_listing(key, content, validators=None):
+    cache.set(key, (content, validators), timeout=settings.CLASS_LIST_CACHE_TIMEOUT)
@@ -0,0 +1,122 @@
+"""
+Live availability events for Server-Sent Events subscribers.
+
+Writes that change a class's slots call publish_availability(), which
+reads the new count once after commit and fans it out to every open
+stream of that class through the broker. Subscribers never query the
+database themselves.
+
+The default broker is in-process, so each ASGI worker only sees changes
+made by itself; BOOKING_EVENT_BROKER can point at a shared broker with
+the same interface.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """
+    One subscriber's queue, bound to the event loop that reads it.
+    Only the newest counts matter, so a full queue drops its oldest message.
+    """
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, message):
+        # Called from whichever thread committed the change
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The subscriber's loop is gone
+            self.close()
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    """
+    Thread-safe in-process pub/sub keyed by channel name.
+    """
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """
+        Subscribe from async code; the returned subscription must be closed.
+        """
+        subscription = Subscription(self, channel, self.maxsize)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def has_subscribers(self, channel):
+        return bool(self._subscribers.get(channel))
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+        return len(subscribers)
+
+
+broker = import_string(getattr(settings, "BOOKING_EVENT_BROKER", "booking.events.InMemoryBroker"))()
+
+
+def class_channel(fitness_class_id):
+    return f"class:{fitness_class_id}"
+
+
+def availability(fitness_class):
+    return {
+        "class_id": fitness_class.id,
+        "total_slots": fitness_class.total_slots,
+        "available_slots": fitness_class.refresh_available_slots(),
+    }
+
+
+def publish_availability(fitness_class_id):
+    """
+    Push the class's slot count to its subscribers once the current
+    transaction commits. Nothing is read when no one is listening.
+    """
+    def publish():
+        channel = class_channel(fitness_class_id)
+        if not broker.has_subscribers(channel):
+            return
+        from booking.models import FitnessClass
+
+        fitness_class = FitnessClass.objects.filter(id=fitness_class_id).first()
+        if fitness_class is not None:
+            broker.publish(channel, availability(fitness_class))
+
+    transaction.on_commit(publish)
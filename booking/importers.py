@@ -0,0 +1,133 @@
+"""
+Bulk import of fitness classes from CSV or JSON Lines.
+"""
+import csv
+import json
+import logging
+import time
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import invalidate_listing
+from .models import FitnessClass
+
+logger = logging.getLogger(__name__)
+
+
+class ClassImporter:
+    """
+    Streams rows of ``name, instructor, datetime, total_slots`` into
+    FitnessClass. Rows are validated with the model's own rules
+    (field validators and FitnessClass.clean) and inserted with
+    bulk_create, one batch at a time, so the input is never fully loaded.
+    """
+    FORMATS = ("csv", "jsonl")
+    max_reported_errors = 1000
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def run(self, stream, fmt):
+        """
+        Import every row from the text ``stream`` and return a report dict.
+        Text that does not decode ends the import with an error on the
+        line after the last one read; the rows before it are kept.
+        """
+        started = time.perf_counter()
+        created = 0
+        failed = 0
+        errors = []
+        batch = []
+
+        line = 0
+        try:
+            for line, row in self.read_rows(stream, fmt):
+                try:
+                    batch.append(self.build(row))
+                except ValidationError as e:
+                    failed += 1
+                    if len(errors) < self.max_reported_errors:
+                        errors.append({"line": line, "errors": e.message_dict})
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    created += self.flush(batch)
+                    batch = []
+        except UnicodeDecodeError:
+            failed += 1
+            errors.append({
+                "line": line + 1,
+                "errors": {"row": "Text is not valid UTF-8; the rest of the file was skipped."},
+            })
+        if batch:
+            created += self.flush(batch)
+
+        if created:
+            invalidate_listing()
+
+        seconds = time.perf_counter() - started
+        logger.info("Imported %d fitness classes, %d rows failed in %.2fs", created, failed, seconds)
+        return {
+            "created": created,
+            "failed": failed,
+            "errors": errors,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round((created + failed) / seconds, 1) if seconds else None,
+        }
+
+    def read_rows(self, stream, fmt):
+        """
+        Yield (line_number, row_dict) pairs from the stream.
+        """
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+        elif fmt == "jsonl":
+            for line, text in enumerate(stream, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError:
+                    row = None
+                yield line, row if isinstance(row, dict) else {"__invalid__": True}
+        else:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+    def build(self, row):
+        """
+        Turn one input row into a validated, unsaved FitnessClass.
+        """
+        if row.get("__invalid__"):
+            raise ValidationError({"row": "Line is not a JSON object."})
+
+        fitness_class = FitnessClass(
+            name=str(row.get("name") or "").strip().upper(),
+            instructor=str(row.get("instructor") or "").strip(),
+            datetime=self.parse_datetime(row.get("datetime")),
+            total_slots=row.get("total_slots"),
+        )
+        fitness_class.clean_fields(exclude=["available_slots"])
+        fitness_class.available_slots = fitness_class.total_slots
+        fitness_class.clean()
+        return fitness_class
+
+    @staticmethod
+    def parse_datetime(value):
+        try:
+            parsed = parse_datetime(str(value).strip()) if value else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({"datetime": "Enter a valid date/time."})
+        if timezone.is_naive(parsed):
+            # Timetables are written in studio local time
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def flush(self, batch):
+        FitnessClass.objects.bulk_create(batch, batch_size=self.batch_size)
+        return len(batch)
@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.importers import ClassImporter
+
+
+class Command(BaseCommand):
+    help = "Import fitness classes from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File with name, instructor, datetime and total_slots columns")
+        parser.add_argument(
+            "--format",
+            choices=ClassImporter.FORMATS,
+            help="Input format; defaults to the file extension",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        fmt = options["format"] or path.suffix.lstrip(".").lower()
+        if fmt not in ClassImporter.FORMATS:
+            raise CommandError(f"Cannot infer format from '{path.name}'; pass --format.")
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive.")
+
+        try:
+            stream = path.open(newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with stream:
+            report = ClassImporter(batch_size=options["batch_size"]).run(stream, fmt)
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} classes, {report['failed']} rows failed "
+            f"in {report['seconds']}s ({report['rows_per_sec']} rows/sec)"
+        ))
@@ -0,0 +1,144 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from booking.cache import invalidate_listing
+from booking.models import Booking, FitnessClass, SlotShard
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare FitnessClass.available_slots (or the shard sums of sharded "
+        "classes) with the actual Booking rows and report, or with --fix "
+        "repair, any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Repair drifted counters")
+        parser.add_argument("--chunk-days", type=int, default=7, help="Days of classes per chunk")
+        parser.add_argument("--since", help="First class date to check (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Last class date to check (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        if options["chunk_days"] <= 0:
+            raise CommandError("--chunk-days must be positive.")
+        start, end = self.get_range(options)
+        if start is None:
+            self.stdout.write("No fitness classes to check.")
+            return
+
+        chunk = timedelta(days=options["chunk_days"])
+        checked = drifted = repaired = 0
+        while start < end:
+            stop = min(start + chunk, end)
+            rows, drift = self.check_chunk(start, stop)
+            checked += rows
+            drifted += len(drift)
+            for class_id, available, expected in drift:
+                self.stdout.write(
+                    f"class {class_id}: available_slots={available}, expected {expected}"
+                )
+            if drift and options["fix"]:
+                repaired += self.repair([class_id for class_id, _, _ in drift])
+            start = stop
+
+        if repaired:
+            invalidate_listing()
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} classes: {drifted} drifted, {repaired} repaired."
+        ))
+
+    def get_range(self, options):
+        bounds = FitnessClass.objects.aggregate(first=Min("datetime"), last=Max("datetime"))
+        if bounds["first"] is None:
+            return None, None
+
+        start, end = bounds["first"], bounds["last"] + timedelta(microseconds=1)
+        for name, days in (("since", 0), ("until", 1)):
+            if not options[name]:
+                continue
+            day = parse_date(options[name])
+            if day is None:
+                raise CommandError(f"--{name} must be a date in YYYY-MM-DD format.")
+            moment = timezone.make_aware(datetime.combine(day + timedelta(days=days), time.min))
+            if name == "since":
+                start = max(start, moment)
+            else:
+                end = min(end, moment)
+        return start, end
+
+    def check_chunk(self, start, stop):
+        """
+        One grouped aggregate counts the bookings of every class in the
+        chunk; returns (classes checked, [(id, available, expected)]).
+        """
+        booked = dict(
+            Booking.objects.filter(
+                fitness_class__datetime__gte=start,
+                fitness_class__datetime__lt=stop,
+            )
+            .order_by()
+            .values("fitness_class_id")
+            .annotate(count=Count("id"))
+            .values_list("fitness_class_id", "count")
+        )
+        sharded = dict(
+            SlotShard.objects.filter(
+                fitness_class__datetime__gte=start,
+                fitness_class__datetime__lt=stop,
+            )
+            .order_by()
+            .values("fitness_class_id")
+            .annotate(total=Sum("available"))
+            .values_list("fitness_class_id", "total")
+        )
+        classes = FitnessClass.objects.filter(
+            datetime__gte=start, datetime__lt=stop
+        ).values_list("id", "total_slots", "available_slots", "slot_shards")
+
+        rows = 0
+        drift = []
+        for class_id, total_slots, available_slots, slot_shards in classes.iterator():
+            rows += 1
+            if slot_shards:
+                available_slots = sharded.get(class_id, 0)
+            expected = max(total_slots - booked.get(class_id, 0), 0)
+            if available_slots != expected:
+                drift.append((class_id, available_slots, expected))
+        return rows, drift
+
+    def repair(self, class_ids):
+        """
+        Recompute the counter inside the UPDATE itself, so bookings made
+        since the check are still counted correctly. Sharded classes are
+        locked and have their shards rebuilt from the booking count.
+        """
+        repaired = 0
+        sharded = FitnessClass.objects.filter(id__in=class_ids, slot_shards__gt=0)
+        for class_id in sharded.values_list("id", flat=True):
+            with transaction.atomic():
+                fitness_class = FitnessClass.objects.select_for_update().get(id=class_id)
+                booked = fitness_class.bookings.count()
+                SlotShard.objects.rebalance(fitness_class, max(fitness_class.total_slots - booked, 0))
+                repaired += 1
+
+        booked = (
+            Booking.objects.filter(fitness_class_id=OuterRef("id"))
+            .order_by()
+            .values("fitness_class_id")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        with transaction.atomic():
+            return repaired + FitnessClass.objects.filter(id__in=class_ids, slot_shards=0).update(
+                available_slots=Greatest(
+                    Value(0),
+                    F("total_slots") - Coalesce(Subquery(booked, output_field=IntegerField()), Value(0)),
+                ),
+                updated_at=timezone.now(),
+            )
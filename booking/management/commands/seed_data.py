@@ -0,0 +1,143 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from booking.cache import invalidate_listing
+from booking.models import Booking, FitnessClass
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic fitness classes and bookings with bulk inserts, "
+        "for load testing. The same --seed produces the same data, relative to today."
+    )
+
+    INSTRUCTORS = [
+        "Asha", "Bilal", "Chen", "Divya", "Elena", "Farhan", "Grace", "Hiro",
+        "Isha", "Jonas", "Kavya", "Liam", "Meera", "Nikhil", "Olga", "Priya",
+    ]
+    # Class start times, in minutes after local midnight
+    START_MINUTES = [6 * 60, 7 * 60, 8 * 60 + 30, 12 * 60, 17 * 60 + 30, 18 * 60 + 30, 19 * 60 + 30]
+    # Bookings are spread over this many minutes before now
+    BOOKED_WITHIN_MINUTES = 30 * 24 * 60
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classes", type=int, default=1000, help="Number of classes to create")
+        parser.add_argument("--bookings", type=int, default=10000, help="Approximate number of bookings, capped by total capacity")
+        parser.add_argument("--clients", type=int, default=5000, help="Size of the client email pool")
+        parser.add_argument("--max-slots", type=int, default=50, help="Largest class capacity")
+        parser.add_argument("--days", type=int, default=90, help="Spread classes over this many days ahead")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk insert")
+        parser.add_argument("--clear", action="store_true", help="Delete every class and booking first")
+
+    def handle(self, *args, **options):
+        for name in ("classes", "clients", "max_slots", "days", "batch_size"):
+            if options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if options["bookings"] < 0:
+            raise CommandError("--bookings cannot be negative.")
+
+        started = time.perf_counter()
+        rng = random.Random(options["seed"])
+        if options["clear"]:
+            Booking.objects.all().delete()
+            FitnessClass.objects.all().delete()
+
+        plan = self.plan_classes(rng, options)
+        insert_sql = self.booking_insert_sql()
+        booked_at = self.booked_at_pool()
+        created_classes = created_bookings = 0
+        batch_size = options["batch_size"]
+        for offset in range(0, len(plan), batch_size):
+            chunk = plan[offset:offset + batch_size]
+            with transaction.atomic():
+                classes = FitnessClass.objects.bulk_create([fitness_class for fitness_class, _ in chunk])
+                rows = self.booking_rows(rng, classes, [booked for _, booked in chunk], options["clients"], booked_at)
+                with connection.cursor() as cursor:
+                    for start in range(0, len(rows), batch_size):
+                        cursor.executemany(insert_sql, rows[start:start + batch_size])
+            created_classes += len(classes)
+            created_bookings += len(rows)
+            self.stdout.write(f"{created_classes} classes, {created_bookings} bookings")
+
+        invalidate_listing()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {created_classes} classes and {created_bookings} bookings in {elapsed:.1f}s "
+            f"({(created_classes + created_bookings) / elapsed:.0f} rows/s)."
+        ))
+
+    def plan_classes(self, rng, options):
+        """
+        Build unsaved classes with their booked counts. Occupancy varies
+        per class around the average that --bookings asks for, so some
+        classes are full and others nearly empty.
+        """
+        names = [name for name, _ in FitnessClass.CLASS_TYPES]
+        midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        max_slots = min(options["max_slots"], options["clients"])
+
+        classes = []
+        for _ in range(options["classes"]):
+            day = rng.randrange(1, options["days"] + 1)
+            start = midnight + timedelta(days=day, minutes=rng.choice(self.START_MINUTES))
+            total_slots = rng.randint(min(10, max_slots), max_slots)
+            classes.append(FitnessClass(
+                name=rng.choice(names),
+                instructor=rng.choice(self.INSTRUCTORS),
+                datetime=start + timedelta(seconds=rng.randrange(60)),
+                total_slots=total_slots,
+                available_slots=total_slots,
+            ))
+
+        mean = min(1.0, options["bookings"] / sum(c.total_slots for c in classes))
+        plan = []
+        for fitness_class in classes:
+            occupancy = rng.betavariate(2 * mean, 2 * (1 - mean)) if 0 < mean < 1 else mean
+            booked = round(fitness_class.total_slots * occupancy)
+            fitness_class.available_slots = fitness_class.total_slots - booked
+            plan.append((fitness_class, booked))
+        return plan
+
+    def booking_insert_sql(self):
+        """
+        Bookings are the bulk of the data, so they skip model instances
+        and per-value field preparation and go in through executemany.
+        """
+        fields = ["fitness_class", "client_name", "client_email", "booked_at", "created_at", "updated_at"]
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(Booking._meta.get_field(name).column) for name in fields)
+        placeholders = ", ".join(["%s"] * len(fields))
+        return f"INSERT INTO {quote(Booking._meta.db_table)} ({columns}) VALUES ({placeholders})"
+
+    def booked_at_pool(self):
+        """
+        Booking times already adapted for the database, one per minute of
+        the booking window, so rows only pick from the list.
+        """
+        now = timezone.now()
+        adapt = connection.ops.adapt_datetimefield_value
+        return [
+            adapt(now - timedelta(minutes=minutes))
+            for minutes in range(self.BOOKED_WITHIN_MINUTES)
+        ]
+
+    def booking_rows(self, rng, classes, booked_counts, clients, booked_at):
+        rows = []
+        for fitness_class, booked in zip(classes, booked_counts):
+            for client in rng.sample(range(clients), booked):
+                stamp = rng.choice(booked_at)
+                rows.append((
+                    fitness_class.id,
+                    f"Client {client}",
+                    f"client{client}@example.com",
+                    stamp,
+                    stamp,
+                    stamp,
+                ))
+        return rows
@@ -1,8 +1,19 @@
-from django.db import models
+import datetime as dt
+import hashlib
+import json
+import random
+
+from django.db import IntegrityError, models, transaction
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Lower
 from utils.basemodel import BaseModel
+from booking.cache import invalidate_listing
+from booking.events import publish_availability
+from utils.db_router import client_pin, pin_to_primary
 import logging
 logger = logging.getLogger(__name__)
 
@@ -29,11 +40,35 @@ class FitnessClass(BaseModel):
     available_slots = models.PositiveIntegerField(
         validators=[MinValueValidator(0)],
     )
+    slot_shards = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Split capacity across this many counter rows; 0 keeps a single counter",
+    )
+    schedule = models.ForeignKey(
+        "ClassSchedule",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="occurrences",
+    )
 
     class Meta:
         ordering = ["datetime"]
         verbose_name = "Fitness Class"
         verbose_name_plural = "Fitness Classes"
+        indexes = [
+            # Serves the upcoming listing, its keyset cursor and time-range scans
+            models.Index(fields=["datetime", "id"], name="fitnessclass_datetime_idx"),
+            # Serves the changes feed's keyset cursor
+            models.Index(fields=["updated_at", "id"], name="fitnessclass_updated_at_idx"),
+        ]
+        constraints = [
+            # One occurrence per schedule slot, so materialization is idempotent
+            models.UniqueConstraint(
+                fields=["schedule", "datetime"],
+                name="unique_schedule_occurrence",
+            ),
+        ]
 
 
     def clean(self):
@@ -48,6 +83,11 @@ class FitnessClass(BaseModel):
                 {"available_slots": "Available slots cannot exceed total slots."}
             )
 
+        if self.slot_shards > self.total_slots:
+            raise ValidationError(
+                {"slot_shards": "Cannot have more shards than total slots."}
+            )
+
         # Ensure class is scheduled for future (only for new classes)
         if not self.pk and self.datetime <= timezone.now():
             raise ValidationError(
@@ -56,12 +96,47 @@ class FitnessClass(BaseModel):
 
     def save(self, *args, **kwargs):
         # Set available_slots to total_slots for new classes
-        if not self.pk:
+        creating = not self.pk
+        if creating:
             self.available_slots = self.total_slots
 
-        self.full_clean()  # Run validation
-        super().save(*args, **kwargs)
-        logger.info(f"Fitness class saved: {self}")
+        with transaction.atomic():
+            resized = not creating and self._carry_over_bookings()
+            self.full_clean()  # Run validation
+            super().save(*args, **kwargs)
+            if (creating and self.slot_shards) or resized:
+                SlotShard.objects.rebalance(self, self.available_slots)
+        invalidate_listing()
+        logger.info("Fitness class saved: %s", self.pk, extra={"class_id": self.pk})
+
+    def _carry_over_bookings(self):
+        """
+        When total_slots or slot_shards changed, set available_slots so the
+        slots already booked stay booked under the new layout. Returns
+        whether the shards need rebuilding.
+        """
+        stored = (
+            FitnessClass.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values("total_slots", "slot_shards", "available_slots")
+            .first()
+        )
+        if stored is None or (stored["total_slots"], stored["slot_shards"]) == (self.total_slots, self.slot_shards):
+            return False
+        available = stored["available_slots"]
+        if stored["slot_shards"]:
+            available = SlotShard.objects.available_by_class([self.pk]).get(self.pk, 0)
+        booked = stored["total_slots"] - available
+        self.available_slots = max(self.total_slots - booked, 0)
+        return True
+
+    def refresh_available_slots(self):
+        """
+        For sharded classes, load available_slots from the sum of the shards.
+        """
+        if self.slot_shards:
+            self.available_slots = SlotShard.objects.available_by_class([self.id]).get(self.id, 0)
+        return self.available_slots
 
     @property
     def is_fully_booked(self):
@@ -74,6 +149,217 @@ class FitnessClass(BaseModel):
         return self.total_slots - self.available_slots
 
 
+class ClassScheduleQuerySet(models.QuerySet):
+    # Cache key remembering how far every schedule is already materialized
+    MATERIALIZED_KEY = "schedules:materialized_until"
+
+    def materialize(self, until):
+        """
+        Create the FitnessClass occurrences of every schedule up to ``until``.
+        Work is done in whole days, so each schedule is extended at most
+        once per day and the cost follows the window, not the schedule length.
+        """
+        until = self.day_after(until)
+        done = cache.get(self.MATERIALIZED_KEY)
+        if done is not None and done >= until:
+            return 0
+
+        pending = self.filter(
+            models.Q(materialized_until__isnull=True) | models.Q(materialized_until__lt=until),
+            models.Q(ends_on__isnull=True) | models.Q(ends_on__gte=timezone.localdate()),
+        )
+
+        created = 0
+        for schedule in pending:
+            start = max(schedule.materialized_until or timezone.now(), timezone.now())
+            with transaction.atomic():
+                occurrences = FitnessClass.objects.bulk_create(
+                    [schedule.occurrence(when) for when in schedule.occurrences_between(start, until)],
+                    ignore_conflicts=True,
+                )
+                ClassSchedule.objects.filter(id=schedule.id).update(materialized_until=until)
+            created += len(occurrences)
+
+        cache.set(self.MATERIALIZED_KEY, until, timeout=None)
+        if created:
+            invalidate_listing()
+            logger.info("Materialized %d scheduled class occurrences", created)
+        return created
+
+    def pending(self, start, end):
+        """
+        Unsaved FitnessClass occurrences of every schedule in [start, end)
+        that have no row yet, ordered by time and schedule. Listings show
+        these past the materialized horizon; booking one creates its row.
+        """
+        schedules = list(self.filter(
+            models.Q(ends_on__isnull=True) | models.Q(ends_on__gte=timezone.localtime(start).date()),
+            starts_on__lte=timezone.localtime(end).date(),
+        ))
+        if not schedules:
+            return []
+        saved = set(
+            FitnessClass.objects.filter(schedule__in=schedules, datetime__gte=start, datetime__lt=end)
+            .values_list("schedule_id", "datetime")
+        )
+        occurrences = [
+            schedule.occurrence(when)
+            for schedule in schedules
+            for when in schedule.occurrences_between(start, end)
+            if (schedule.id, when) not in saved
+        ]
+        return sorted(occurrences, key=lambda occurrence: (occurrence.datetime, occurrence.schedule_id))
+
+    @staticmethod
+    def day_after(until):
+        """
+        The local midnight after ``until``; schedules materialize in whole days.
+        """
+        until = timezone.localtime(until).replace(hour=0, minute=0, second=0, microsecond=0)
+        return until + dt.timedelta(days=1)
+
+
+class ClassSchedule(BaseModel):
+    """
+    Recurring class template, e.g. Yoga every Mon/Wed at 07:00.
+    Occurrences become FitnessClass rows when the rolling horizon reaches
+    them or when they are first booked; listings further ahead show them
+    unsaved.
+    """
+
+    WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+    name = models.CharField(max_length=100, choices=FitnessClass.CLASS_TYPES)
+    instructor = models.CharField(max_length=100)
+    total_slots = models.PositiveIntegerField(
+        validators=[MinValueValidator(1)],
+    )
+    weekdays = models.CharField(
+        max_length=20,
+        help_text="Comma-separated days, RRULE BYDAY style: MO,WE,FR",
+    )
+    start_time = models.TimeField(help_text="Local start time of every occurrence")
+    starts_on = models.DateField()
+    ends_on = models.DateField(null=True, blank=True)
+    materialized_until = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ClassScheduleQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["starts_on", "start_time"]
+        verbose_name = "Class Schedule"
+        verbose_name_plural = "Class Schedules"
+
+    def clean(self):
+        super().clean()
+
+        days = self.weekdays.upper().replace(" ", "").split(",") if self.weekdays else []
+        if not days or any(day not in self.WEEKDAYS for day in days):
+            raise ValidationError(
+                {"weekdays": f"Use comma-separated days from {', '.join(self.WEEKDAYS)}."}
+            )
+        self.weekdays = ",".join(days)
+
+        if self.ends_on and self.starts_on and self.ends_on < self.starts_on:
+            raise ValidationError({"ends_on": "End date cannot be before the start date."})
+
+    def save(self, *args, **kwargs):
+        self.full_clean()
+        super().save(*args, **kwargs)
+        # Force the next listing to extend this schedule
+        cache.delete(ClassScheduleQuerySet.MATERIALIZED_KEY)
+        # Listings past the horizon show its occurrences unsaved
+        invalidate_listing()
+        logger.info("Class schedule saved: %s", self.pk, extra={"schedule_id": self.pk})
+
+    def occurrence(self, when):
+        """
+        An unsaved FitnessClass for this schedule's occurrence at ``when``.
+        """
+        return FitnessClass(
+            name=self.name,
+            instructor=self.instructor,
+            datetime=when,
+            total_slots=self.total_slots,
+            available_slots=self.total_slots,
+            schedule=self,
+        )
+
+    def materialize_occurrence(self, when):
+        """
+        The FitnessClass row of the occurrence at ``when``, created if it
+        was only listed so far. None if the schedule has no occurrence then.
+        """
+        if when not in self.occurrences_between(when, when + dt.timedelta(microseconds=1)):
+            return None
+        occurrence = FitnessClass.objects.filter(schedule=self, datetime=when).first()
+        if occurrence is None:
+            # A concurrent first booking may insert it too
+            FitnessClass.objects.bulk_create([self.occurrence(when)], ignore_conflicts=True)
+            invalidate_listing()
+            occurrence = FitnessClass.objects.get(schedule=self, datetime=when)
+        return occurrence
+
+    def occurrences_between(self, start, end):
+        """
+        Yield the aware datetimes of this schedule in [start, end).
+        """
+        days = {self.WEEKDAYS.index(day) for day in self.weekdays.split(",")}
+        day = max(timezone.localtime(start).date(), self.starts_on)
+        last = timezone.localtime(end).date()
+        if self.ends_on:
+            last = min(last, self.ends_on)
+
+        while day <= last:
+            if day.weekday() in days:
+                occurrence = timezone.make_aware(dt.datetime.combine(day, self.start_time))
+                if start <= occurrence < end:
+                    yield occurrence
+            day += dt.timedelta(days=1)
+
+
+class BookingQuerySet(models.QuerySet):
+
+    def for_email(self, email):
+        """
+        Case-insensitive email match that can use the lower(client_email) index,
+        unlike client_email__iexact.
+        """
+        return self.alias(client_email_lower=Lower("client_email")).filter(
+            client_email_lower=email.lower()
+        )
+
+    def summary(self):
+        """
+        Booking counts for a client's dashboard, computed in the database:
+        one aggregate for the totals and one grouped count per class type.
+        """
+        now = timezone.now()
+        month_start = timezone.localtime(now).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + dt.timedelta(days=32)).replace(day=1)
+        upcoming = models.Q(fitness_class__datetime__gt=now)
+
+        totals = self.aggregate(
+            total=models.Count("id"),
+            upcoming=models.Count("id", filter=upcoming),
+            this_month=models.Count(
+                "id",
+                filter=models.Q(
+                    fitness_class__datetime__gte=month_start,
+                    fitness_class__datetime__lt=next_month,
+                ),
+            ),
+            next_class_at=models.Min("fitness_class__datetime", filter=upcoming),
+        )
+        totals["by_class_type"] = dict(
+            self.order_by()
+            .values("fitness_class__name")
+            .annotate(count=models.Count("id"))
+            .values_list("fitness_class__name", "count")
+        )
+        return totals
+
+
 class Booking(BaseModel):
     fitness_class = models.ForeignKey(
         FitnessClass,
@@ -84,15 +370,349 @@ class Booking(BaseModel):
     client_email = models.EmailField()
     booked_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BookingQuerySet.as_manager()
+
     class Meta:
         ordering = ["-booked_at"]
         unique_together = [
             "fitness_class",
             "client_email",
         ]  # Prevent duplicate bookings
+        indexes = [
+            # Serves a client's history newest first and its keyset cursor
+            models.Index(
+                Lower("client_email"),
+                models.F("booked_at").desc(),
+                models.F("id").desc(),
+                name="booking_email_booked_at_idx",
+            ),
+        ]
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        logger.info(f"Booking created: {self}")
+        logger.info(
+            "Booking created: %s", self.pk,
+            extra={"booking_id": self.pk, "class_id": self.fitness_class_id},
+        )
+
+    def cancel(self):
+        """
+        Delete the booking and hand its slot on, in one transaction.
+        Only the request that actually deletes the row frees a slot, so
+        concurrent cancels of the same booking cannot over-restore it.
+        Returns False if the booking was already gone.
+        """
+        with transaction.atomic():
+            deleted, _ = Booking.objects.filter(id=self.id).delete()
+            if not deleted:
+                return False
+            WaitlistEntry.objects.promote_or_release(self.fitness_class_id)
+            pin_to_primary(client_pin(self.client_email))
+        logger.info(
+            "Booking cancelled: %s", self.id,
+            extra={"booking_id": self.id, "class_id": self.fitness_class_id},
+        )
+        return True
+
+
+class WaitlistQuerySet(models.QuerySet):
+
+    def for_email(self, email):
+        """
+        Case-insensitive email match on the lower(client_email) index.
+        """
+        return self.alias(client_email_lower=Lower("client_email")).filter(
+            client_email_lower=email.lower()
+        )
+
+    def promote_or_release(self, fitness_class_id):
+        """
+        Give a freed slot to the head of the class's waitlist, or return it
+        to available_slots when nobody is waiting. Call this inside the
+        transaction that freed the slot. The head is found with one seek on
+        the (fitness_class, position) index, so promotion is O(1) per slot.
+        Returns the promoted Booking, or None.
+        """
+        while True:
+            # Concurrent cancellations skip a head another one is promoting
+            head = (
+                self.select_for_update(skip_locked=True)
+                .filter(fitness_class_id=fitness_class_id)
+                .order_by("position")
+                .first()
+            )
+            if head is None:
+                released = FitnessClass.objects.filter(
+                    id=fitness_class_id,
+                    slot_shards=0,
+                    available_slots__lt=models.F("total_slots"),
+                ).update(
+                    available_slots=models.F("available_slots") + 1,
+                    updated_at=timezone.now(),
+                )
+                if not released:
+                    SlotShard.objects.release(fitness_class_id)
+                invalidate_listing()
+                publish_availability(fitness_class_id)
+                return None
+
+            if not WaitlistEntry.objects.filter(id=head.id).delete()[0]:
+                continue
+            try:
+                with transaction.atomic():
+                    booking = Booking.objects.create(
+                        fitness_class_id=fitness_class_id,
+                        client_name=head.client_name,
+                        client_email=head.client_email,
+                    )
+            except IntegrityError:
+                # Already booked since joining; offer the slot to the next one
+                continue
+            pin_to_primary(client_pin(booking.client_email))
+            logger.info(
+                "Promoted from waitlist: %s", booking.pk,
+                extra={"booking_id": booking.pk, "class_id": fitness_class_id},
+            )
+            return booking
+
+
+class WaitlistEntry(BaseModel):
+    """
+    FIFO waitlist position for a fully booked fitness class.
+    """
+    fitness_class = models.ForeignKey(
+        FitnessClass,
+        on_delete=models.CASCADE,
+        related_name="waitlist",
+    )
+    client_name = models.CharField(max_length=100)
+    client_email = models.EmailField()
+    position = models.PositiveBigIntegerField()
+
+    objects = WaitlistQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["position"]
+        constraints = [
+            # Also the index used to find the head of a class's waitlist
+            models.UniqueConstraint(
+                fields=["fitness_class", "position"],
+                name="unique_waitlist_position",
+            ),
+            models.UniqueConstraint(
+                fields=["fitness_class", "client_email"],
+                name="unique_waitlist_client",
+            ),
+        ]
+        indexes = [
+            # Serves a client's waitlist entries
+            models.Index(Lower("client_email"), name="waitlist_email_idx"),
+        ]
+        verbose_name = "Waitlist Entry"
+        verbose_name_plural = "Waitlist Entries"
+
+
+class SlotShardQuerySet(models.QuerySet):
+
+    def claim(self, fitness_class_id):
+        """
+        Take one slot from a random shard that still has capacity, with a
+        conditional UPDATE on that shard only. Returns False when every
+        shard is empty.
+        """
+        candidates = list(
+            self.filter(fitness_class_id=fitness_class_id, available__gt=0)
+            .values_list("id", flat=True)
+        )
+        random.shuffle(candidates)
+        for shard_id in candidates:
+            if self.filter(id=shard_id, available__gt=0).update(
+                available=models.F("available") - 1,
+                updated_at=timezone.now(),
+            ):
+                return True
+        return False
+
+    def claim_many(self, fitness_class_id, count):
+        """
+        Take ``count`` slots at once for batch bookings. The class's shards
+        are locked in id order and drained one after another; returns how
+        many slots were actually taken.
+        """
+        claimed = 0
+        shards = self.select_for_update().filter(
+            fitness_class_id=fitness_class_id, available__gt=0
+        ).order_by("id")
+        for shard in shards:
+            take = min(shard.available, count - claimed)
+            self.filter(id=shard.id).update(
+                available=models.F("available") - take,
+                updated_at=timezone.now(),
+            )
+            claimed += take
+            if claimed == count:
+                break
+        return claimed
+
+    def release(self, fitness_class_id):
+        """
+        Return one slot to a random shard that is below its capacity.
+        """
+        candidates = list(
+            self.filter(fitness_class_id=fitness_class_id, available__lt=models.F("capacity"))
+            .values_list("id", flat=True)
+        )
+        random.shuffle(candidates)
+        for shard_id in candidates:
+            if self.filter(id=shard_id, available__lt=models.F("capacity")).update(
+                available=models.F("available") + 1,
+                updated_at=timezone.now(),
+            ):
+                return True
+        return False
+
+    def rebalance(self, fitness_class, available):
+        """
+        Recreate the class's shards so they hold ``available`` slots in
+        total, splitting total_slots evenly across the shard capacities.
+        """
+        with transaction.atomic():
+            self.filter(fitness_class=fitness_class).delete()
+            if not fitness_class.slot_shards:
+                return
+            base, extra = divmod(fitness_class.total_slots, fitness_class.slot_shards)
+            shards = []
+            for index in range(fitness_class.slot_shards):
+                capacity = base + (1 if index < extra else 0)
+                shard_available = min(capacity, available)
+                available -= shard_available
+                shards.append(SlotShard(
+                    fitness_class=fitness_class,
+                    index=index,
+                    capacity=capacity,
+                    available=shard_available,
+                ))
+            self.bulk_create(shards)
+
+    def lock_available(self, fitness_class_ids):
+        """
+        Lock the classes' shards in id order and return their summed
+        available slots per class. Single bookings cannot claim from the
+        shards until the transaction ends, so the sums stay true.
+        """
+        available = {}
+        for fitness_class_id, shard_available in (
+            self.select_for_update()
+            .filter(fitness_class_id__in=fitness_class_ids)
+            .order_by("id")
+            .values_list("fitness_class_id", "available")
+        ):
+            available[fitness_class_id] = available.get(fitness_class_id, 0) + shard_available
+        return available
+
+    def available_by_class(self, fitness_class_ids):
+        """
+        Sum of available shard slots per class, in one grouped query.
+        """
+        return dict(
+            self.filter(fitness_class_id__in=fitness_class_ids)
+            .order_by()
+            .values("fitness_class_id")
+            .annotate(total=models.Sum("available"))
+            .values_list("fitness_class_id", "total")
+        )
+
+
+class SlotShard(models.Model):
+    """
+    One slice of a sharded class's capacity. Bookings for popular classes
+    decrement a random shard instead of all contending for the single
+    FitnessClass row; the class's availability is the sum of its shards.
+    """
+    fitness_class = models.ForeignKey(
+        FitnessClass,
+        on_delete=models.CASCADE,
+        related_name="shards",
+    )
+    index = models.PositiveSmallIntegerField()
+    capacity = models.PositiveIntegerField()
+    available = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SlotShardQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["fitness_class", "index"]
+        indexes = [
+            # Lets the changes feed find recently claimed or released shards
+            models.Index(fields=["updated_at"], name="slotshard_updated_at_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fitness_class", "index"],
+                name="unique_slot_shard",
+            ),
+        ]
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+
+    def lookup(self, scope, key):
+        """
+        The live entry for ``key``, in one indexed lookup. An expired entry
+        is deleted on the spot so the key can be used again.
+        """
+        entry = self.filter(scope=scope, key=key).first()
+        if entry is not None and entry.expires_at <= timezone.now():
+            self.filter(id=entry.id).delete()
+            return None
+        return entry
+
+    def purge_expired(self, batch_size=1000):
+        """
+        Delete expired entries in batches; returns how many were removed.
+        """
+        purged = 0
+        while True:
+            ids = list(
+                self.filter(expires_at__lte=timezone.now())
+                .order_by("expires_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return purged
+            purged += self.filter(id__in=ids).delete()[0]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response of a request made with an Idempotency-Key header,
+    replayed when a client retries with the same key.
+    """
+    scope = models.CharField(max_length=20)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=32)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "key"],
+                name="unique_idempotency_key",
+            ),
+        ]
+
+    @staticmethod
+    def fingerprint_of(payload):
+        """
+        Hash of the request payload, so a key reused for a different
+        request can be told apart from a retry.
+        """
+        canonical = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.md5(canonical.encode()).hexdigest()
@@ -1,15 +1,166 @@
 """
 Serializers for the fitness booking API.
 """
+import datetime
+from collections import Counter
+
 from rest_framework import serializers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
-from django.db import transaction
-from .models import FitnessClass, Booking
+from django.db import models, transaction
+from django.db.models import Case, F, Max, QuerySet, When
+from .models import ClassSchedule, FitnessClass, Booking, SlotShard, WaitlistEntry
+from .cache import invalidate_listing
+from .events import publish_availability
+from utils.db_router import client_pin, pin_to_primary
+from utils.renderers import RawJSON, encode_string
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class LocalTimeFormatter:
+    """
+    Formats aware datetimes in the current timezone the way DRF's
+    DateTimeField and ``strftime('%Y-%m-%d %H:%M:%S %Z')`` do, resolving
+    the UTC offset once per calendar day instead of once per value.
+    """
+
+    def __init__(self, tz=None):
+        self.tz = tz or timezone.get_current_timezone()
+        self._days = {}
+
+    def __call__(self, value):
+        """
+        Return (iso_string, display_string) for an aware datetime.
+        """
+        key = (value.date(), value.tzinfo)
+        day = self._days.get(key)
+        if day is None:
+            day = self._days[key] = self._resolve_day(value)
+
+        if day is False:
+            # The offset changes during this day; resolve it per value
+            local = value.astimezone(self.tz)
+            iso = local.isoformat()
+            if iso.endswith('+00:00'):
+                iso = iso[:-6] + 'Z'
+            return iso, local.strftime('%Y-%m-%d %H:%M:%S %Z')
+
+        shift, suffix, name = day
+        local_iso = (value.replace(tzinfo=None) + shift).isoformat()
+        return local_iso + suffix, f"{local_iso[:10]} {local_iso[11:19]} {name}"
+
+    def _resolve_day(self, value):
+        start = value.replace(hour=0, minute=0, second=0, microsecond=0)
+        first = start.astimezone(self.tz)
+        last = (start + datetime.timedelta(days=1, microseconds=-1)).astimezone(self.tz)
+        if first.utcoffset() != last.utcoffset() or first.tzname() != last.tzname():
+            return False
+
+        offset = first.utcoffset()
+        suffix = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone(offset)).isoformat()[19:]
+        if suffix == '+00:00':
+            suffix = 'Z'
+        return offset - value.utcoffset(), suffix, first.tzname()
+
+
+class FitnessClassListSerializer(serializers.ListSerializer):
+    """
+    Bulk serializer used for FitnessClassSerializer(many=True).
+    Reads plain rows and builds the same output as the per-object
+    serializer in one pass, without DRF field machinery per row.
+    """
+    value_fields = [
+        'id', 'name', 'instructor', 'datetime', 'total_slots', 'available_slots', 'slot_shards', 'schedule_id'
+    ]
+
+    output_fields = [
+        'id', 'name', 'name_display', 'instructor', 'datetime', 'datetime_ist',
+        'total_slots', 'available_slots', 'booked_slots', 'is_fully_booked', 'schedule_id',
+    ]
+    # One row of output as JSON; strings are passed in already quoted
+    row_template = '{' + ','.join(f'"{field}":%s' for field in output_fields) + '}'
+
+    def to_representation(self, data):
+        return [dict(zip(self.output_fields, values)) for values in self.row_values(data)]
+
+    def encode_rows(self, data):
+        """
+        The same rows as to_representation, each encoded as a JSON object
+        string directly from its values.
+        """
+        quote = encode_string
+        template = self.row_template
+        return [
+            template % (
+                class_id if class_id is not None else 'null',
+                quote(name), quote(name_display), quote(instructor),
+                quote(datetime_iso) if datetime_iso is not None else 'null',
+                quote(datetime_ist) if datetime_ist is not None else 'null',
+                total_slots, available_slots, booked_slots,
+                'true' if fully_booked else 'false',
+                schedule_id if schedule_id is not None else 'null',
+            )
+            for (
+                class_id, name, name_display, instructor, datetime_iso, datetime_ist,
+                total_slots, available_slots, booked_slots, fully_booked, schedule_id,
+            ) in self.row_values(data)
+        ]
+
+    def to_json(self, data):
+        """
+        The serialized list as RawJSON, for EnvelopeJSONRenderer to splice in.
+        """
+        return RawJSON(('[' + ','.join(self.encode_rows(data)) + ']').encode())
+
+    def row_values(self, data):
+        """
+        Output values per row, in output_fields order.
+        """
+        if isinstance(data, QuerySet):
+            data = data.values(*self.value_fields)
+        data = self.with_shard_availability(data)
+
+        name_choices = dict(FitnessClass._meta.get_field('name').flatchoices)
+        local_time = LocalTimeFormatter()
+        for row in data:
+            if row['datetime']:
+                datetime_iso, datetime_ist = local_time(row['datetime'])
+            else:
+                datetime_iso = datetime_ist = None
+            yield (
+                row['id'],
+                row['name'],
+                name_choices.get(row['name'], row['name']),
+                row['instructor'],
+                datetime_iso,
+                datetime_ist,
+                row['total_slots'],
+                row['available_slots'],
+                row['total_slots'] - row['available_slots'],
+                row['available_slots'] == 0,
+                row['schedule_id'],
+            )
+
+    def with_shard_availability(self, data):
+        """
+        Replace available_slots of sharded classes with the sum of their
+        shards, in one grouped query for the whole page.
+        """
+        rows = [
+            row if isinstance(row, dict) else {field: getattr(row, field) for field in self.value_fields}
+            for row in data
+        ]
+        sharded = [row['id'] for row in rows if row['slot_shards']]
+        if sharded:
+            available = SlotShard.objects.available_by_class(sharded)
+            for row in rows:
+                if row['slot_shards']:
+                    row['available_slots'] = available.get(row['id'], 0)
+        return rows
+
+
 class FitnessClassSerializer(serializers.ModelSerializer):
     """
     Serializer for FitnessClass model.
@@ -19,15 +170,25 @@ class FitnessClassSerializer(serializers.ModelSerializer):
     datetime_ist = serializers.SerializerMethodField()
     is_fully_booked = serializers.ReadOnlyField()
     booked_slots = serializers.ReadOnlyField()
+    schedule_id = serializers.ReadOnlyField()
     
     class Meta:
         model = FitnessClass
         fields = [
             'id', 'name', 'name_display', 'instructor', 
             'datetime', 'datetime_ist', 'total_slots', 
-            'available_slots', 'booked_slots', 'is_fully_booked'
+            'available_slots', 'booked_slots', 'is_fully_booked', 'schedule_id', 'slot_shards'
         ]
         read_only_fields = ['id', 'available_slots', 'booked_slots', 'is_fully_booked']
+        extra_kwargs = {'slot_shards': {'write_only': True}}
+        list_serializer_class = FitnessClassListSerializer
+
+    def validate(self, data):
+        total_slots = data.get('total_slots', getattr(self.instance, 'total_slots', 0))
+        slot_shards = data.get('slot_shards', getattr(self.instance, 'slot_shards', 0))
+        if slot_shards > total_slots:
+            raise serializers.ValidationError({'slot_shards': "Cannot have more shards than total slots."})
+        return data
     
     def get_datetime_ist(self, obj):
         """
@@ -40,11 +201,48 @@ class FitnessClassSerializer(serializers.ModelSerializer):
         return None
 
 
+class ClassScheduleSerializer(serializers.ModelSerializer):
+    """
+    Serializer for recurring class schedules.
+    """
+    name_display = serializers.CharField(source='get_name_display', read_only=True)
+
+    class Meta:
+        model = ClassSchedule
+        fields = [
+            'id', 'name', 'name_display', 'instructor', 'total_slots',
+            'weekdays', 'start_time', 'starts_on', 'ends_on', 'materialized_until'
+        ]
+        read_only_fields = ['id', 'materialized_until']
+
+    def validate(self, data):
+        """
+        Run the model's own validation so API and admin agree.
+        """
+        instance = ClassSchedule(**data)
+        try:
+            instance.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        data['weekdays'] = instance.weekdays
+        return data
+
+
 class BookingRequestSerializer(serializers.Serializer):
     """
     Serializer for handling booking requests.
+    Scheduled classes listed without an id are booked by schedule_id
+    and class_datetime instead of class_id.
     """
-    class_id = serializers.IntegerField(help_text="ID of the fitness class to book")
+    class_id = serializers.IntegerField(required=False, help_text="ID of the fitness class to book")
+    schedule_id = serializers.IntegerField(
+        required=False,
+        help_text="Schedule of a listed class without an id"
+    )
+    class_datetime = serializers.DateTimeField(
+        required=False,
+        help_text="Start of a listed class without an id"
+    )
     client_name = serializers.CharField(
         max_length=100,
         help_text="Name of the client making the booking"
@@ -66,62 +264,298 @@ class BookingRequestSerializer(serializers.Serializer):
         if fitness_class.datetime <= timezone.now():
             raise serializers.ValidationError("Cannot book a class that has already started or finished.")
         
+        fitness_class.refresh_available_slots()
+        # Keep the instance so validate() and create() don't fetch it again
+        self._fitness_class = fitness_class
         return value
     
+    def validate_occurrence(self, schedule_id, when):
+        """
+        Resolve a scheduled class that was listed without an id, creating
+        its FitnessClass row for this first booking.
+        """
+        if schedule_id is None or when is None:
+            raise serializers.ValidationError({'class_id': "Give class_id, or schedule_id and class_datetime."})
+        if when <= timezone.now():
+            raise serializers.ValidationError(
+                {'class_datetime': "Cannot book a class that has already started or finished."}
+            )
+        schedule = ClassSchedule.objects.filter(id=schedule_id).first()
+        fitness_class = schedule.materialize_occurrence(when) if schedule else None
+        if fitness_class is None:
+            raise serializers.ValidationError({'class_datetime': "The schedule has no class at this time."})
+
+        fitness_class.refresh_available_slots()
+        self._fitness_class = fitness_class
+        return fitness_class.id
+
     def validate(self, data):
         """
         Cross-field validation for booking request.
+        Duplicate bookings are left to the unique constraint on insert.
         """
-        try:
-            fitness_class = FitnessClass.objects.get(id=data['class_id'])
-            
-            # Check if user already booked this class
-            existing_booking = Booking.objects.filter(
-                fitness_class=fitness_class,
-                client_email=data['client_email']
-            ).exists()
-            
-            if existing_booking:
-                raise serializers.ValidationError("You have already booked this class.")
-            
-            # Check available slots
-            if fitness_class.available_slots <= 0:
-                raise serializers.ValidationError("No available slots for this class.")
-                
-        except FitnessClass.DoesNotExist:
-            raise serializers.ValidationError("Fitness class not found.")
+        if data.get('class_id') is None:
+            data['class_id'] = self.validate_occurrence(data.get('schedule_id'), data.get('class_datetime'))
+
+        # Fail fast on a full class; create() re-checks atomically
+        if self._fitness_class.available_slots <= 0:
+            raise serializers.ValidationError("No available slots for this class.")
         
         return data
     
     def create(self, validated_data):
         """
         Create a new booking with atomic transaction to prevent race conditions.
+        The slot is claimed with a single conditional UPDATE instead of
+        locking and re-saving the fitness class row; sharded classes take
+        it from one of their shards instead.
         """
-        class_id = validated_data['class_id']
-        client_name = validated_data['client_name']
-        client_email = validated_data['client_email']
+        fitness_class = self._fitness_class
         
         with transaction.atomic():
-            # Lock the fitness class row to prevent race conditions
-            fitness_class = FitnessClass.objects.select_for_update().get(id=class_id)
+            if fitness_class.slot_shards:
+                reserved = SlotShard.objects.claim(fitness_class.id)
+            else:
+                reserved = FitnessClass.objects.filter(
+                    id=fitness_class.id,
+                    available_slots__gt=0,
+                ).update(
+                    available_slots=F('available_slots') - 1,
+                    updated_at=timezone.now(),
+                )
             
-            # Double-check availability (in case of concurrent requests)
-            if fitness_class.available_slots <= 0:
+            # Zero rows means a concurrent request took the last slot
+            if not reserved:
                 raise serializers.ValidationError("No available slots for this class.")
             
-            # Create the booking
+            # A duplicate booking raises IntegrityError and rolls back the decrement
             booking = Booking.objects.create(
                 fitness_class=fitness_class,
-                client_name=client_name,
-                client_email=client_email
+                client_name=validated_data['client_name'],
+                client_email=validated_data['client_email']
             )
-            
-            # Decrease available slots
-            fitness_class.available_slots -= 1
-            fitness_class.save()
-            
-            logger.info(f"Booking successful: {booking}")
-            return booking
+            invalidate_listing()
+            publish_availability(fitness_class.id)
+            pin_to_primary(client_pin(booking.client_email))
+        
+        # Reflect the reservation on the instance used for the response
+        fitness_class.available_slots -= 1
+        logger.info(
+            "Booking successful: %s", booking.pk,
+            extra={"booking_id": booking.pk, "class_id": fitness_class.id},
+        )
+        return booking
+
+
+class BatchBookingItemSerializer(serializers.Serializer):
+    """
+    One (class, client) pair inside a batch booking request.
+    """
+    class_id = serializers.IntegerField(help_text="ID of the fitness class to book")
+    client_name = serializers.CharField(
+        max_length=100,
+        help_text="Name of the client making the booking"
+    )
+    client_email = serializers.EmailField(
+        help_text="Email address of the client"
+    )
+
+
+class BatchBookingRequestSerializer(serializers.Serializer):
+    """
+    Serializer for booking many (class, client) pairs in one transaction.
+    """
+    ALL_OR_NOTHING = "all_or_nothing"
+    BEST_EFFORT = "best_effort"
+
+    mode = serializers.ChoiceField(
+        choices=[ALL_OR_NOTHING, BEST_EFFORT],
+        default=ALL_OR_NOTHING,
+        help_text="all_or_nothing books every item or none; best_effort books what it can"
+    )
+    bookings = BatchBookingItemSerializer(many=True, allow_empty=False, max_length=500)
+
+    def create(self, validated_data):
+        """
+        Lock the affected classes and their slot shards once, in id order
+        so concurrent batches cannot deadlock, then check duplicates with
+        one set-based query and insert every accepted booking with
+        bulk_create.
+        """
+        items = validated_data['bookings']
+        class_ids = sorted({item['class_id'] for item in items})
+
+        with transaction.atomic():
+            classes = {
+                fitness_class.id: fitness_class
+                for fitness_class in FitnessClass.objects.select_for_update()
+                .filter(id__in=class_ids).order_by('id')
+            }
+            # Stamp updated_at once the locks are held, close to the commit
+            now = timezone.now()
+            taken = set(
+                Booking.objects.filter(
+                    fitness_class_id__in=class_ids,
+                    client_email__in={item['client_email'] for item in items}
+                ).values_list('fitness_class_id', 'client_email')
+            )
+            sharded = SlotShard.objects.lock_available([
+                class_id for class_id, fitness_class in classes.items() if fitness_class.slot_shards
+            ])
+            remaining = {
+                class_id: sharded.get(class_id, 0) if fitness_class.slot_shards
+                else fitness_class.available_slots
+                for class_id, fitness_class in classes.items()
+            }
+
+            results = []
+            accepted = []
+            for index, item in enumerate(items):
+                fitness_class = classes.get(item['class_id'])
+                pair = (item['class_id'], item['client_email'])
+                if fitness_class is None:
+                    error = "Fitness class not found."
+                elif fitness_class.datetime <= now:
+                    error = "Cannot book a class that has already started or finished."
+                elif pair in taken:
+                    error = "You have already booked this class."
+                elif remaining[fitness_class.id] <= 0:
+                    error = "No available slots for this class."
+                else:
+                    error = None
+                    taken.add(pair)
+                    remaining[fitness_class.id] -= 1
+                    accepted.append((index, Booking(
+                        fitness_class=fitness_class,
+                        client_name=item['client_name'],
+                        client_email=item['client_email']
+                    )))
+                results.append({
+                    'index': index,
+                    'class_id': item['class_id'],
+                    'client_email': item['client_email'],
+                    'status': 'failed' if error else 'booked',
+                    'error': error,
+                    'booking_id': None,
+                })
+
+            failed = len(results) - len(accepted)
+            if failed and validated_data['mode'] == self.ALL_OR_NOTHING:
+                for index, _ in accepted:
+                    results[index]['status'] = 'skipped'
+                return {'booked': 0, 'failed': failed, 'results': results}
+
+            if accepted:
+                bookings = Booking.objects.bulk_create([booking for _, booking in accepted])
+                for (index, _), booking in zip(accepted, bookings):
+                    results[index]['booking_id'] = booking.id
+
+                booked = Counter(booking.fitness_class_id for _, booking in accepted)
+                unsharded = {}
+                for class_id, count in booked.items():
+                    if not classes[class_id].slot_shards:
+                        unsharded[class_id] = count
+                    elif SlotShard.objects.claim_many(class_id, count) < count:
+                        # The shards are locked since they were counted, so
+                        # this only guards against a drifted count
+                        raise serializers.ValidationError("No available slots for this class.")
+
+                # One UPDATE decrements every other class by its booked count
+                if unsharded:
+                    FitnessClass.objects.filter(id__in=unsharded).update(
+                        available_slots=Case(*[
+                            When(id=class_id, then=F('available_slots') - count)
+                            for class_id, count in unsharded.items()
+                        ]),
+                        updated_at=now,
+                    )
+                invalidate_listing()
+                for class_id in booked:
+                    publish_availability(class_id)
+                pin_to_primary(*{client_pin(booking.client_email) for _, booking in accepted})
+
+        logger.info("Batch booking: %d booked, %d failed", len(accepted), failed)
+        return {'booked': len(accepted), 'failed': failed, 'results': results}
+
+
+class WaitlistRequestSerializer(BookingRequestSerializer):
+    """
+    Serializer for joining the waitlist of a fully booked class.
+    Classes listed without an id still have every slot, so the waitlist
+    always names the class by id.
+    """
+    class_id = serializers.IntegerField(help_text="ID of the fitness class to wait for")
+    schedule_id = None
+    class_datetime = None
+
+    def validate(self, data):
+        """
+        The waitlist is only for full classes the client has not booked.
+        """
+        if self._fitness_class.available_slots > 0:
+            raise serializers.ValidationError("Slots are available; book the class instead.")
+        if Booking.objects.filter(
+            fitness_class=self._fitness_class,
+            client_email=data['client_email']
+        ).exists():
+            raise serializers.ValidationError("You have already booked this class.")
+        return data
+
+    def create(self, validated_data):
+        """
+        Append to the tail of the waitlist. The class row is locked so
+        concurrent joins get consecutive positions.
+        """
+        with transaction.atomic():
+            fitness_class = FitnessClass.objects.select_for_update().get(id=self._fitness_class.id)
+            tail = fitness_class.waitlist.aggregate(tail=Max('position'))['tail'] or 0
+            entry = WaitlistEntry.objects.create(
+                fitness_class=fitness_class,
+                client_name=validated_data['client_name'],
+                client_email=validated_data['client_email'],
+                position=tail + 1
+            )
+        logger.info(
+            "Joined waitlist: %s", entry.pk,
+            extra={"waitlist_id": entry.pk, "class_id": entry.fitness_class_id},
+        )
+        return entry
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    """
+    Serializer for a waitlist entry.
+    """
+    class_id = serializers.IntegerField(source='fitness_class_id', read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'class_id', 'client_name', 'client_email', 'position', 'created_at']
+        read_only_fields = fields
+
+
+class BookingListSerializer(serializers.ListSerializer):
+    """
+    Loads the shard sums of every sharded class on the page in one
+    grouped query, so BookingSerializer reports their real availability.
+    Views that already loaded them pass them in as ``shard_availability``
+    in the context.
+    """
+
+    @staticmethod
+    def load_shard_availability(bookings):
+        """
+        {class_id: shard sum} for the sharded classes of ``bookings``.
+        """
+        sharded = {booking.fitness_class_id for booking in bookings if booking.fitness_class.slot_shards}
+        return SlotShard.objects.available_by_class(sharded) if sharded else {}
+
+    def to_representation(self, data):
+        bookings = list(data.all() if isinstance(data, (models.Manager, QuerySet)) else data)
+        self.shard_availability = self.context.get('shard_availability')
+        if self.shard_availability is None:
+            self.shard_availability = self.load_shard_availability(bookings)
+        return super().to_representation(bookings)
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -138,13 +572,23 @@ class BookingSerializer(serializers.ModelSerializer):
             'booked_at', 'booked_at_ist', 'fitness_class_details'
         ]
         read_only_fields = ['id', 'booked_at']
+        list_serializer_class = BookingListSerializer
     
     def get_fitness_class_details(self, obj):
         """
         Get detailed information about the booked fitness class.
+        Sharded classes report the sum of their shards, which is what
+        bookings claim from; their available_slots column is not updated.
         """
         fitness_class = obj.fitness_class
         ist_datetime = timezone.localtime(fitness_class.datetime)
+        available_slots = fitness_class.available_slots
+        if fitness_class.slot_shards:
+            shard_availability = getattr(self.parent, 'shard_availability', None)
+            if shard_availability is None:
+                available_slots = fitness_class.refresh_available_slots()
+            else:
+                available_slots = shard_availability.get(fitness_class.id, 0)
         
         return {
             'id': fitness_class.id,
@@ -153,7 +597,7 @@ class BookingSerializer(serializers.ModelSerializer):
             'datetime': fitness_class.datetime.isoformat(),
             'datetime_ist': ist_datetime.strftime('%Y-%m-%d %H:%M:%S %Z'),
             'total_slots': fitness_class.total_slots,
-            'available_slots': fitness_class.available_slots
+            'available_slots': available_slots
         }
     
     def get_booked_at_ist(self, obj):
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.middleware.RequestMetricsMiddleware',
+    'utils.middleware.ListGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,13 +78,111 @@ WSGI_APPLICATION = 'fitness_booking.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite profile for concurrent bookings. WAL lets readers run alongside
+# the single writer; IMMEDIATE transactions take the write lock when they
+# begin, so concurrent writers wait up to the busy timeout instead of
+# failing with "database is locked" when a read lock cannot be upgraded.
+# init_command runs on every new connection, and persistent connections
+# keep that cost off the request path.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA mmap_size=134217728',
+    'PRAGMA journal_size_limit=67108864',
+]
+SQLITE_BUSY_TIMEOUT_SECONDS = 20
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT_SECONDS,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Tests run on a file too, so concurrent writers behave as in production
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Read replicas: comma-separated SQLite files that the deployment keeps in
+# sync with db.sqlite3. The class listing and booking history read from
+# them (utils/db_router.py); booking validation and writes use the primary.
+DATABASE_READ_ALIASES = []
+for number, name in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT_SECONDS,
+            'init_command': ';'.join(SQLITE_PRAGMAS + ['PRAGMA query_only=1']),
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_READ_ALIASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['utils.db_router.ReadReplicaRouter']
+
+# After a write, replica reads of the data it touched (a client's bookings,
+# the class listing) go to the primary for this long, so clients read
+# their own writes while the replicas catch up.
+DATABASE_REPLICA_LAG_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fitness-booking',
     }
 }
 
+# Seconds a rendered page of GET /api/v1/classes/ may be served from cache.
+# Writes invalidate immediately; the timeout only bounds how long a class
+# that has just started can still appear in the listing.
+CLASS_LIST_CACHE_TIMEOUT = 30
+
+# GET /api/v1/classes/changes/ only reports changes at least this many seconds
+# old. Writes stamp updated_at before they commit, so a poll could otherwise
+# move its cursor past a change that was not visible yet.
+CLASS_CHANGES_SAFETY_LAG_SECONDS = 2
+
+# Recurring class schedules are materialized into FitnessClass rows this many
+# days ahead. Listings further out show occurrences unsaved, up to the max
+# window; an occurrence gets its row when it is first booked.
+CLASS_SCHEDULE_HORIZON_DAYS = 14
+CLASS_SCHEDULE_MAX_WINDOW_DAYS = 366
+
+# Live availability streams (GET /api/v1/classes/<id>/stream/, ASGI only).
+# The broker fans out slot changes to subscribers; the default one is
+# in-process, so run a single worker or plug in a shared broker.
+BOOKING_EVENT_BROKER = 'booking.events.InMemoryBroker'
+CLASS_STREAM_KEEPALIVE_SECONDS = 15
+
+# Seconds a stored POST /api/v1/book/ response stays replayable for its
+# Idempotency-Key; purge_idempotency_keys removes expired entries.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+
+# Responses smaller than this are sent uncompressed; larger ones (class
+# listings, booking history pages) are gzipped for clients that accept it.
+GZIP_MIN_BYTES = 1024
+
+
+# Request metrics for /api/v1/, exposed at /metrics/ in Prometheus format.
+# A sample rate above 0 logs the full query trace of that share of requests.
+METRICS_PATH_PREFIX = '/api/v1/'
+METRICS_QUERY_TRACE_SAMPLE_RATE = 0.0
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -103,12 +204,23 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 REST_FRAMEWORK = {
+    # The browsable API is a development aid; in production every response
+    # is JSON and content negotiation is skipped.
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-    ],
+        'utils.renderers.EnvelopeJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'utils.renderers.APIFirstContentNegotiation',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    'EXCEPTION_HANDLER': 'utils.exceptions.custom_exception_handler',
+}
+
+# Token-bucket throttles (utils/throttling.py), kept in the default cache.
+# "60/min" allows a burst of 60 requests that refills over a minute.
+THROTTLE_RATES = {
+    'class_list': '300/min',
+    'booking_client': '30/min',
+    'booking_class': '600/min',
 }
 
 # Internationalization
@@ -136,9 +248,8 @@ LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
+        'json': {
+            '()': 'utils.logs.JsonFormatter',
         },
         'simple': {
             'format': '{levelname} {message}',
@@ -150,19 +261,31 @@ LOGGING = {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': BASE_DIR / 'fitness_booking.log',
-            'formatter': 'verbose',
+            'formatter': 'json',
         },
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        # Application code only enqueues; a background thread writes to
+        # the file and console handlers through the sink logger
+        'queue': {
+            '()': 'utils.logs.QueuedHandler',
+            'sink': 'booking_sink',
+            'maxsize': 10000,
+        },
     },
     'loggers': {
         'booking': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
+        'booking_sink': {
+            'handlers': ['file', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
-}
\ No newline at end of file
+}
@@ -0,0 +1,55 @@
+"""
+Conditional GET helpers for list endpoints.
+
+Views compute a cheap validator (a row count and the newest timestamp)
+before serializing anything; when the client's If-None-Match or
+If-Modified-Since still matches, they answer 304 and skip the work.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class Validators:
+    """
+    ETag and Last-Modified for one response.
+    """
+    __slots__ = ("etag", "last_modified")
+
+    def __init__(self, etag, last_modified=None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_parts(cls, *parts, last_modified=None):
+        """
+        Build a weak ETag from the given parts, e.g. (count, newest updated_at).
+        """
+        digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+        return cls(f'W/"{digest}"', last_modified)
+
+    def not_modified(self, request):
+        """
+        Return a 304 response if the request's validators still match, else None.
+        """
+        response = get_conditional_response(
+            request,
+            etag=self.etag,
+            last_modified=self.timestamp,
+        )
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response.headers["ETag"] = self.etag
+        if self.last_modified is not None:
+            response.headers["Last-Modified"] = http_date(self.timestamp)
+        return response
+
+    @property
+    def timestamp(self):
+        if self.last_modified is None:
+            return None
+        return int(self.last_modified.timestamp())
@@ -0,0 +1,85 @@
+"""
+Primary/replica database routing.
+
+Every query goes to the primary ("default") unless the code around it
+opts in with replica_reads(): the class listing and booking history do,
+booking validation and creation never do. Inside a transaction on the
+primary, reads stay on the primary too.
+
+Replicas lag behind the primary, so writes pin the data they touched to
+the primary for DATABASE_REPLICA_LAG_SECONDS: a client's own bookings
+right after they book or cancel, and the class listing after any class
+or slot change. Pins live in the default cache.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+
+
+def read_aliases():
+    return getattr(settings, "DATABASE_READ_ALIASES", [])
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Route reads in this block to one replica, picked once so that every
+    query of a response sees the same snapshot. Yields the alias, or
+    None when there are no replicas or ``enabled`` is false.
+    """
+    aliases = read_aliases()
+    alias = random.choice(aliases) if enabled and aliases else None
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def _pin_key(name):
+    return f"db:pinned:{name}"
+
+
+def pin_to_primary(*names):
+    """
+    Send replica reads of ``names`` to the primary until the replicas
+    have caught up with the current transaction.
+    """
+    if not read_aliases():
+        return
+    timeout = settings.DATABASE_REPLICA_LAG_SECONDS
+    transaction.on_commit(lambda: cache.set_many({_pin_key(name): True for name in names}, timeout=timeout))
+
+
+def is_pinned(name):
+    return bool(read_aliases()) and cache.get(_pin_key(name)) is not None
+
+
+def client_pin(email):
+    return f"client:{email.strip().lower()}"
+
+
+class ReadReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db not in read_aliases()
@@ -0,0 +1,15 @@
+from rest_framework import exceptions
+from rest_framework.views import exception_handler
+
+from utils.response import CustomResponse
+from utils.throttling import retry_after
+
+
+def custom_exception_handler(exc, context):
+    """
+    DRF's handler, except that throttled requests get the usual error
+    envelope with a Retry-After header.
+    """
+    if isinstance(exc, exceptions.Throttled):
+        return CustomResponse.throttled_response(retry_after(exc.wait or 1))
+    return exception_handler(exc, context)
@@ -0,0 +1,140 @@
+"""
+Non-blocking logging: records go onto a bounded in-memory queue and a
+background thread formats and writes them.
+
+QueuedHandler is the only handler on the application loggers, so a log
+call inside a transaction costs a put_nowait and never touches the disk
+while row locks are held. The listener thread hands each record to the
+``sink`` logger, whose handlers (file, console) do the formatting and
+I/O. When the queue is full the record is dropped and counted rather
+than blocking the caller.
+
+Records cross threads unformatted, so log arguments should be values
+that do not change afterwards (ids, strings, saved instances).
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came in through extra=
+RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, message, the
+    record's extra fields and any exception text.
+    """
+
+    def format(self, record):
+        event = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.thread,
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS and not key.startswith("_"):
+                event[key] = value
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            event["exc"] = record.exc_text
+        if record.stack_info:
+            event["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(event, default=str)
+
+
+class _Listener(QueueListener):
+
+    def enqueue_sentinel(self):
+        # Wait for room: the stdlib put_nowait raises when the queue is full
+        self.queue.put(self._sentinel)
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Enqueue records for a listener thread that forwards them to the
+    ``sink`` logger. The listener starts on first use (and again in a
+    forked worker); closing the handler drains the queue.
+    """
+
+    def __init__(self, sink, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.sink = sink
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # The stdlib handler formats here, in the logging thread; leave
+        # that to the sink's handlers on the listener thread instead
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # A forked child inherits the queue but not the listener thread
+                self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = _Listener(self.queue, logging.getLogger(self.sink))
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def drain(self):
+        """
+        Block until every queued record has been handed to the sink.
+        """
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def close(self):
+        # logging.shutdown() closes handlers newest first, so this drains
+        # into the sink's handlers before they are closed
+        self.drain()
+        super().close()
+
+
+def queued_handlers():
+    """
+    Every QueuedHandler installed by the logging config.
+    """
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.root.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    seen = []
+    for logger in loggers:
+        for handler in logger.handlers:
+            if isinstance(handler, QueuedHandler) and handler not in seen:
+                seen.append(handler)
+    return seen
+
+
+def exposition_lines():
+    """
+    Dropped-record counter summed over the queued handlers.
+    """
+    name = "booking_log_records_dropped_total"
+    dropped = sum(handler.dropped for handler in queued_handlers())
+    return [f"# TYPE {name} counter", f"{name} {dropped}"]
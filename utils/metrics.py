@@ -0,0 +1,194 @@
+"""
+In-process request metrics with Prometheus text exposition.
+
+RequestMetricsMiddleware opens a RequestMetrics record for every API
+request. A database execute wrapper and track_serializer() add to it,
+and on response the totals are folded into per-endpoint histograms that
+the metrics view renders.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger("booking.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; observe() is O(log buckets) under a lock.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """
+    Histograms keyed by (metric name, endpoint) plus extra collectors that
+    contribute their own exposition lines.
+    """
+    METRICS = {
+        "booking_http_request_duration_seconds": ("Wall time per request.", LATENCY_BUCKETS),
+        "booking_db_queries_per_request": ("Database queries per request.", QUERY_COUNT_BUCKETS),
+        "booking_db_duration_seconds": ("Database time per request.", LATENCY_BUCKETS),
+        "booking_serializer_duration_seconds": ("Serializer time per request.", LATENCY_BUCKETS),
+        "booking_http_response_size_bytes": ("Response body size.", SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name, endpoint, value):
+        key = (name, endpoint)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.METRICS[name][1]))
+        histogram.observe(value)
+
+    def register_collector(self, collector):
+        """
+        Register a callable returning extra exposition lines.
+        """
+        self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def render(self):
+        lines = []
+        for name, (help_text, buckets) in self.METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, endpoint), histogram in sorted(self._histograms.items()):
+                if metric != name:
+                    continue
+                counts, total, count = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {total}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {count}')
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """
+    Totals for the request currently being handled.
+    """
+    __slots__ = ("db_queries", "db_seconds", "serializer_seconds", "trace")
+
+    def __init__(self, trace=False):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.trace = [] if trace else None
+
+
+def start_request(trace=False):
+    metrics = RequestMetrics(trace=trace)
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def track_serializer():
+    """
+    Attribute the enclosed block to serializer time of the current request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_seconds += time.perf_counter() - started
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.db_queries += 1
+        metrics.db_seconds += elapsed
+        if metrics.trace is not None:
+            metrics.trace.append((round(elapsed * 1000, 3), sql))
+
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    # Installed on every new connection, so queries issued from
+    # sync_to_async worker threads are counted too
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_wrapper)
+
+
+def should_trace(rate):
+    return rate > 0 and random.random() < rate
+
+
+def log_trace(endpoint, metrics):
+    logger.info(
+        "Query trace for %s: %d queries, %.3f ms",
+        endpoint,
+        metrics.db_queries,
+        metrics.db_seconds * 1000,
+        extra={"queries": metrics.trace},
+    )
+
+
+def metrics_view(request):
+    """
+    Expose the registry in the Prometheus text format.
+    """
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
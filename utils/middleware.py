@@ -0,0 +1,81 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from utils import metrics
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, DB queries and time, serializer time and response
+    size for API requests into per-endpoint histograms. A sampled share
+    of requests also logs its full query trace.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = getattr(settings, "METRICS_PATH_PREFIX", "/api/v1/")
+        self.trace_rate = getattr(settings, "METRICS_QUERY_TRACE_SAMPLE_RATE", 0.0)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        request_metrics, token = metrics.start_request(metrics.should_trace(self.trace_rate))
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, request_metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.prefix):
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        request_metrics, token = metrics.start_request(metrics.should_trace(self.trace_rate))
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, request_metrics, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, request_metrics, elapsed):
+        match = request.resolver_match
+        endpoint = match.url_name if match and match.url_name else "unmatched"
+
+        metrics.registry.observe("booking_http_request_duration_seconds", endpoint, elapsed)
+        metrics.registry.observe("booking_db_queries_per_request", endpoint, request_metrics.db_queries)
+        metrics.registry.observe("booking_db_duration_seconds", endpoint, request_metrics.db_seconds)
+        metrics.registry.observe("booking_serializer_duration_seconds", endpoint, request_metrics.serializer_seconds)
+        if not response.streaming:
+            metrics.registry.observe("booking_http_response_size_bytes", endpoint, len(response.content))
+
+        if request_metrics.trace is not None:
+            metrics.log_trace(endpoint, request_metrics)
+
+
+class ListGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves small responses and event streams alone:
+    compressing a short envelope costs more than it saves, and each
+    Server-Sent Event would become its own gzip member.
+    """
+
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        if not response.streaming and len(response.content) < settings.GZIP_MIN_BYTES:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,108 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.settings import api_settings
+
+from utils.response import CustomResponse
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a unique ordering such as ("datetime", "id").
+
+    The cursor encodes the ordering values of the last row on the page, so
+    each page is a single indexed range scan instead of an OFFSET.
+    Subclasses set ``ordering``; prefix a field with "-" for descending.
+    """
+    ordering = None
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.page_from(list(self.seek(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant for plain Django async views.
+        """
+        return self.page_from([row async for row in self.seek(queryset, request)])
+
+    def seek(self, queryset, request):
+        """
+        Order the queryset, skip past the cursor and limit it to one page.
+        """
+        params = self._query_params(request)
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.seek_filter(self.decode_cursor(cursor, queryset.model)))
+
+        # Fetch one extra row to learn whether there is a next page
+        return queryset[:self.page_size + 1]
+
+    def page_from(self, rows):
+        page = rows[:self.page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if len(rows) > self.page_size else None
+        return page
+
+    def get_paginated_response(self, data):
+        return CustomResponse.paginated_response(data, next_cursor=self.next_cursor)
+
+    def get_page_size(self, request):
+        try:
+            size = int(self._query_params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def seek_filter(self, values):
+        """
+        Build (a > x) OR (a = x AND b > y) ... for the configured ordering.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, item):
+        values = [self._position(item, field.lstrip("-")) for field in self.ordering]
+        payload = json.dumps(values, default=lambda value: value.isoformat())
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _query_params(request):
+        # DRF requests expose query_params; plain Django requests only GET
+        return getattr(request, "query_params", request.GET)
+
+    @staticmethod
+    def _position(item, name):
+        # Pages may hold model instances or .values() rows
+        if isinstance(item, dict):
+            return item[name]
+        return getattr(item, name)
@@ -0,0 +1,66 @@
+"""
+JSON rendering for CustomResponse envelopes.
+
+Bulk serializers can encode their rows straight to JSON and hand the
+result over as RawJSON; EnvelopeJSONRenderer then encodes only the small
+envelope around it and splices the bytes in, instead of walking the rows
+again. Any other data renders exactly as with DRF's JSONRenderer.
+"""
+import json
+from json.encoder import encode_basestring
+
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+
+
+class RawJSON(bytes):
+    """
+    A value that is already encoded as UTF-8 JSON.
+    """
+
+
+def encode_string(value):
+    """
+    Quote a string the way JSONRenderer does, including its escaping of
+    the line and paragraph separators that JavaScript rejects.
+    """
+    encoded = encode_basestring(value)
+    if "\u2028" in encoded or "\u2029" in encoded:
+        encoded = encoded.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+    return encoded
+
+
+class EnvelopeJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        raw = data.get("data") if isinstance(data, dict) else None
+        if not isinstance(raw, RawJSON):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            # Indentation was asked for, so the rows have to be re-encoded
+            return super().render({**data, "data": json.loads(raw)}, accepted_media_type, renderer_context)
+
+        # "data" always closes the envelope, so it goes last
+        head = super().render({key: value for key, value in data.items() if key != "data"})
+        separator = b"," if len(head) > 2 else b""
+        return b"".join((head[:-1], separator, b'"data":', raw, b"}"))
+
+
+class APIFirstContentNegotiation(DefaultContentNegotiation):
+    """
+    Hand API clients the first renderer (JSON) without parsing Accept.
+    Anything more specific, such as a browser asking for HTML, a media
+    type parameter or a ?format= override, is negotiated as usual.
+    """
+    api_accepts = ("", "*/*", "application/json")
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        if (
+            request.META.get("HTTP_ACCEPT", "").strip() in self.api_accepts
+            and not format_suffix
+            and self.settings.URL_FORMAT_OVERRIDE not in request.query_params
+        ):
+            renderer = renderers[0]
+            return renderer, renderer.media_type
+        return super().select_renderer(request, renderers, format_suffix)
@@ -1,5 +1,7 @@
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
 
 class CustomResponse:
     """
@@ -18,6 +20,60 @@ class CustomResponse:
             status=status.HTTP_200_OK
         )
 
+    @staticmethod
+    def paginated_response(data, next_cursor=None, message="Data fetched successfully"):
+        return Response(
+            {
+                "status": "success",
+                "message": message,
+                "count": len(data),
+                "next_cursor": next_cursor,
+                "data": data
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @staticmethod
+    def stream_list_response(rows, message="Data fetched successfully", rows_per_chunk=100):
+        """
+        Stream a list envelope without building the full list in memory.
+        The count is only known once the rows are exhausted, so it is
+        written after the data.
+        """
+        def chunks():
+            encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+            chunk = []
+            for row in rows:
+                chunk.append(encoder.encode(row))
+                if len(chunk) == rows_per_chunk:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        return CustomResponse.stream_encoded_list_response(chunks(), message)
+
+    @staticmethod
+    def stream_encoded_list_response(chunks, message="Data fetched successfully"):
+        """
+        Like stream_list_response, for rows already encoded as JSON
+        strings and grouped into chunks.
+        """
+        def render():
+            yield '{"status":"success","message":%s,"data":[' % JSONEncoder(ensure_ascii=False).encode(message)
+            count = 0
+            for chunk in chunks:
+                if chunk:
+                    yield ("," if count else "") + ",".join(chunk)
+                    count += len(chunk)
+            yield '],"count":%d}' % count
+
+        return StreamingHttpResponse(
+            render(),
+            content_type="application/json",
+            status=status.HTTP_200_OK
+        )
+
     @staticmethod
     def single_item_response(data, message="Data fetched successfully"):
         return Response(
@@ -72,6 +128,17 @@ class CustomResponse:
             status=status_code
         )
 
+    @staticmethod
+    def throttled_response(retry_after, message="Too many requests. Please retry later."):
+        return Response(
+            {
+                "status": "error",
+                "message": message
+            },
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": retry_after}
+        )
+
     @staticmethod
     def not_found_response(message="Not found"):
         return Response(
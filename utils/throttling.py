@@ -0,0 +1,161 @@
+"""
+Token-bucket throttling kept in Django's cache.
+
+Each bucket holds ``capacity`` tokens and refills at capacity per period
+(a rate of "60/min" allows bursts of 60 and a steady 1 request a second).
+State is two cache keys per bucket: the time the bucket started filling
+and the number of tokens taken since, which only ever changes through
+the cache's atomic incr/decr. No database queries are made.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse DRF-style "<requests>/<period>" rates into (capacity, seconds).
+    """
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucket:
+
+    def __init__(self, scope, rate):
+        self.scope = scope
+        self.capacity, period = parse_rate(rate)
+        self.refill_per_second = self.capacity / period
+        # Idle buckets expire once they would have refilled several times over
+        self.timeout = max(60, math.ceil(10 * period))
+
+    def consume(self, ident, now=None):
+        """
+        Take one token for ``ident``. Returns None when allowed, otherwise
+        the seconds until a token is available.
+        """
+        now = time.time() if now is None else now
+        start_key = f"throttle:{self.scope}:{ident}:start"
+        taken_key = f"throttle:{self.scope}:{ident}:taken"
+
+        start = cache.get(start_key)
+        if start is None:
+            # A new bucket starts full
+            start = now - self.capacity / self.refill_per_second
+            cache.set_many({start_key: start, taken_key: 0}, timeout=self.timeout)
+        try:
+            taken = cache.incr(taken_key)
+        except ValueError:
+            cache.add(taken_key, 0, timeout=self.timeout)
+            taken = cache.incr(taken_key)
+
+        available = (now - start) * self.refill_per_second - taken
+        if available >= 0:
+            if available > self.capacity - 1:
+                # Never bank more than a full bucket; racing writers compute
+                # nearly the same start, so a lost update is harmless
+                start = now - (self.capacity - 1 + taken) / self.refill_per_second
+                cache.set(start_key, start, timeout=self.timeout)
+            return None
+
+        # Hand the token back so rejected requests do not drain the bucket
+        cache.decr(taken_key)
+        return -available / self.refill_per_second
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle over a TokenBucket. Subclasses set ``scope`` (a key of
+    settings.THROTTLE_RATES) and may override get_ident_from(); returning
+    None leaves the request unthrottled.
+    """
+    scope = None
+
+    def get_ident_from(self, request, data):
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        data = request.data if request.method == "POST" else None
+        return self.allow(request, data)
+
+    def allow(self, request, data=None):
+        self.wait_time = None
+        rate = settings.THROTTLE_RATES.get(self.scope)
+        ident = self.get_ident_from(request, data)
+        if rate is None or ident is None:
+            return True
+        self.wait_time = TokenBucket(self.scope, rate).consume(ident)
+        return self.wait_time is None
+
+    def wait(self):
+        return self.wait_time
+
+
+class ClassListThrottle(TokenBucketThrottle):
+    scope = "class_list"
+
+
+class BookingClientThrottle(TokenBucketThrottle):
+    """
+    Per client: keyed by the booking's email, or the IP without one.
+    """
+    scope = "booking_client"
+
+    def get_ident_from(self, request, data):
+        email = data.get("client_email") if hasattr(data, "get") else None
+        if isinstance(email, str) and email.strip():
+            return email.strip().lower()
+        return self.get_ident(request)
+
+
+class BookingClassThrottle(TokenBucketThrottle):
+    """
+    Per class: caps the booking attempts one class can draw.
+    """
+    scope = "booking_class"
+
+    def get_ident_from(self, request, data):
+        if not hasattr(data, "get"):
+            return None
+        try:
+            return int(data.get("class_id"))
+        except (TypeError, ValueError):
+            pass
+        # A scheduled class listed without an id is named by schedule and start
+        schedule_id, start = data.get("schedule_id"), data.get("class_datetime")
+        if schedule_id is not None and start:
+            return f"{schedule_id}@{start}"
+        return None
+
+
+class FirstDenialMixin:
+    """
+    For DRF views: stop at the first throttle that denies the request,
+    so later buckets are not charged for a request that is rejected anyway.
+    """
+
+    def check_throttles(self, request):
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
+
+
+def check_throttles(request, throttles, data=None):
+    """
+    Apply throttles outside DRF views (the async views), stopping at the
+    first denial. Returns the wait in seconds, or None when allowed.
+    """
+    for throttle_class in throttles:
+        throttle = throttle_class()
+        if not throttle.allow(request, data):
+            return throttle.wait()
+    return None
+
+
+def retry_after(wait):
+    return str(max(1, math.ceil(wait)))